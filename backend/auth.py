@@ -1,11 +1,17 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import Admin
 from schemas import AdminCreate, AdminLogin, Token
 import os
@@ -13,21 +19,52 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Seconds an authenticated admin is trusted without re-reading the admins table.
+# Changes made through this process invalidate at once; this bounds staleness on other workers.
+PRINCIPAL_CACHE_TTL = float(os.getenv("ADMIN_PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("ADMIN_PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+
+# pbkdf2 iterations for new hashes; stored hashes with a different count are rehashed on login
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Threads that run password hashing; bounds how much CPU a login burst can take
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
 # Use pbkdf2_sha256 instead of bcrypt to avoid 72-byte limit issues
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS
+)
 security = HTTPBearer()
 
+# hashlib's pbkdf2 releases the GIL, so hashing here leaves the event loop free for other requests
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def hash_password(password: str) -> str:
+    """get_password_hash, run on the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Verify on the hashing pool; also returns a replacement hash if the stored one uses outdated settings."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -38,31 +75,78 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_admin_by_email(db: Session, email: str) -> Optional[Admin]:
-    return db.query(Admin).filter(Admin.email == email).first()
+async def get_admin_by_email(db: AsyncSession, email: str) -> Optional[Admin]:
+    result = await db.execute(select(Admin).where(Admin.email == email))
+    return result.scalars().first()
 
-def authenticate_admin(db: Session, email: str, password: str) -> Optional[Admin]:
-    print(f"Authenticating admin: {email}")
-    admin = get_admin_by_email(db, email)
+async def authenticate_admin(db: AsyncSession, email: str, password: str) -> Optional[Admin]:
+    admin = await get_admin_by_email(db, email)
     if not admin:
-        print(f"No admin found with email: {email}")
+        logger.debug("No admin found with email: %s", email)
         return None
     
-    print(f"Admin found, verifying password...")
-    password_valid = verify_password(password, admin.hashed_password)
-    print(f"Password valid: {password_valid}")
-    
+    password_valid, new_hash = await verify_and_update_password(password, admin.hashed_password)
     if not password_valid:
-        print(f"Password verification failed for: {email}")
+        logger.debug("Password verification failed for: %s", email)
         return None
     
-    print(f"Authentication successful for: {email}")
+    if new_hash:
+        # PASSWORD_HASH_ROUNDS changed since this hash was made; store it with the current cost
+        admin.hashed_password = new_hash
+        await db.commit()
+        logger.info("Rehashed password for: %s", email)
+    
+    logger.debug("Authentication successful for: %s", email)
     return admin
 
+def create_admin_token(admin: Admin) -> str:
+    """Access token naming the admin by id, stamped with their current token version."""
+    return create_access_token(
+        data={"sub": str(admin.id), "email": admin.email, "ver": admin.token_version or 0},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+class AdminPrincipal:
+    """The authenticated admin as seen by request handlers; safe to share between requests."""
+    
+    __slots__ = ("id", "email", "is_active", "token_version", "created_at", "expires_at")
+    
+    def __init__(self, admin: Admin):
+        self.id = admin.id
+        self.email = admin.email
+        self.is_active = admin.is_active
+        self.token_version = admin.token_version or 0
+        self.created_at = admin.created_at
+        self.expires_at = time.monotonic() + PRINCIPAL_CACHE_TTL
+
+_principals: "OrderedDict[int, AdminPrincipal]" = OrderedDict()
+
+async def get_admin_principal(db: AsyncSession, admin_id: int) -> Optional[AdminPrincipal]:
+    principal = _principals.get(admin_id)
+    if principal is not None and principal.expires_at > time.monotonic():
+        _principals.move_to_end(admin_id)
+        return principal
+    
+    admin = await db.get(Admin, admin_id)
+    if admin is None:
+        _principals.pop(admin_id, None)
+        return None
+    
+    principal = AdminPrincipal(admin)
+    _principals[admin_id] = principal
+    _principals.move_to_end(admin_id)
+    while len(_principals) > PRINCIPAL_CACHE_MAX_ENTRIES:
+        _principals.popitem(last=False)
+    return principal
+
+def invalidate_admin_principal(admin_id: int):
+    """Drop a cached admin; call after committing a password change or deactivation."""
+    _principals.pop(admin_id, None)
+
 async def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> Admin:
+    db: AsyncSession = Depends(get_async_db)
+) -> AdminPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -71,13 +155,15 @@ async def get_current_admin(
     
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        admin_id = int(payload.get("sub"))
+        token_version = payload.get("ver")
+        if token_version is None:
             raise credentials_exception
-    except JWTError:
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
     
-    admin = get_admin_by_email(db, email=email)
-    if admin is None:
+    # Served from the principal cache on most requests, so auth costs no query
+    principal = await get_admin_principal(db, admin_id)
+    if principal is None or not principal.is_active or principal.token_version != token_version:
         raise credentials_exception
-    return admin
+    return principal
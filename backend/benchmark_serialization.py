@@ -0,0 +1,94 @@
+"""
+Per-track cost of serializing a playlist for the read endpoints: the ORM + Pydantic path
+against the Core row + orjson path. Runs against a throwaway SQLite database.
+
+    python benchmark_serialization.py [--tracks 200] [--rounds 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'benchmark.db')}"
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from database import engine, SessionLocal, AsyncSessionLocal, Base
+from models import Admin, Playlist, Track, Recording
+from schemas import PlaylistWithTracks
+from fast_json import PLAYLIST_COLUMNS, dumps, with_tracks
+from track_order import position_key
+from catalog import recording_fingerprint
+
+def seed(track_count: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        admin = Admin(email="bench@example.com", hashed_password="-")
+        db.add(admin)
+        db.flush()
+        playlist = Playlist(title="Benchmark", class_date=datetime(2026, 1, 5, 7), created_by=admin.id)
+        db.add(playlist)
+        db.flush()
+        for i in range(track_count):
+            title, artist, duration = f"Song {i}", f"Artist {i % 40}", 180.0 + i
+            recording = Recording(
+                fingerprint=recording_fingerprint(artist, title, duration), title=title, artist=artist,
+                album=f"Album {i % 15}", duration=duration, genre="House", release_year=2000 + i % 25,
+                apple_music_url=f"https://music.apple.com/track/{i}", artwork_url=f"https://img.example.com/{i}.jpg"
+            )
+            db.add(recording)
+            db.flush()
+            # Half the tracks fall back to the recording for album and genre
+            db.add(Track(
+                playlist_id=playlist.id, recording_id=recording.id, title=title, artist=artist,
+                album=None if i % 2 else recording.album, genre=None if i % 2 else "House",
+                duration=duration, bpm=120 + i % 20, notes="Climb" if i % 5 == 0 else None,
+                position=position_key(i + 1)
+            ))
+        db.commit()
+        return playlist.id
+
+async def orm_body(db, playlist_id: int) -> bytes:
+    # What the endpoints did before: hydrate ORM objects, validate them, encode with the stdlib
+    result = await db.execute(select(Playlist).options(selectinload(Playlist.tracks)).where(Playlist.id == playlist_id))
+    playlist = PlaylistWithTracks.model_validate(result.scalars().first())
+    content = playlist.model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+async def core_body(db, playlist_id: int) -> bytes:
+    result = await db.execute(select(*PLAYLIST_COLUMNS).where(Playlist.id == playlist_id))
+    playlist, = await with_tracks(db, [result.first()])
+    return dumps(playlist)
+
+async def measure(build, playlist_id: int, rounds: int) -> float:
+    async with AsyncSessionLocal() as db:
+        await build(db, playlist_id)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await build(db, playlist_id)
+            # A request gets a fresh session; don't let the identity map carry objects over
+            db.expunge_all()
+        return (time.perf_counter() - start) / rounds
+
+async def main(track_count: int, rounds: int):
+    playlist_id = seed(track_count)
+    async with AsyncSessionLocal() as db:
+        assert json.loads(await orm_body(db, playlist_id)) == json.loads(await core_body(db, playlist_id))
+    
+    before = await measure(orm_body, playlist_id, rounds)
+    after = await measure(core_body, playlist_id, rounds)
+    print(f"{track_count} tracks, {rounds} rounds (query + serialization)")
+    for label, seconds in (("ORM + Pydantic", before), ("Core rows + orjson", after)):
+        print(f"  {label:<20} {seconds * 1000:8.2f} ms/playlist {seconds / track_count * 1e6:8.1f} us/track")
+    print(f"  speedup {before / after:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.tracks, args.rounds))
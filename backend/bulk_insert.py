@@ -0,0 +1,64 @@
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import insert, Table
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Track
+
+load_dotenv()
+
+# Set to "false" to use executemany on PostgreSQL as well (e.g. behind poolers that block COPY)
+USE_COPY = os.getenv("BULK_INSERT_USE_COPY", "true").lower() == "true"
+
+# Columns written by the bulk path; anything else in a track dict is ignored
+TRACK_COLUMNS = [
+    'playlist_id', 'position', 'title', 'artist', 'album', 'duration', 'bpm', 'genre', 'notes',
+    'apple_music_url', 'youtube_url', 'spotify_url', 'artwork_url', 'release_year', 'recording_id'
+]
+
+async def bulk_insert_tracks(db: AsyncSession, playlist_id: int, tracks: Iterable[Dict[str, Any]]) -> int:
+    """
+    Insert many tracks into a playlist without going through the ORM unit of work.
+    Uses COPY on PostgreSQL and a single executemany INSERT elsewhere.
+    Runs inside the session's transaction; the caller commits. Returns the row count.
+    """
+    rows = [_track_row(playlist_id, track_data) for track_data in tracks]
+    if not rows:
+        return 0
+    
+    if USE_COPY and db.get_bind().dialect.name == "postgresql":
+        await _copy_tracks(db, rows)
+    else:
+        await db.execute(insert(Track.__table__), rows)
+    return len(rows)
+
+def _track_row(playlist_id: int, track_data: Dict[str, Any]) -> Dict[str, Any]:
+    row = {column: coerce_value(Track.__table__, column, track_data.get(column)) for column in TRACK_COLUMNS}
+    row['playlist_id'] = playlist_id
+    return row
+
+_python_types: Dict[Tuple[str, str], type] = {}
+
+def coerce_value(table: Table, column: str, value: Any) -> Any:
+    """Convert a value to its column's Python type, or None if it can't be."""
+    # asyncpg (and COPY's binary protocol) need values that already have the column's type
+    # (enrichment hands back release years as strings, for example)
+    python_type = _python_types.get((table.name, column))
+    if python_type is None:
+        python_type = _python_types[(table.name, column)] = table.columns[column].type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    try:
+        return python_type(value)
+    except (TypeError, ValueError):
+        return None
+
+async def _copy_tracks(db: AsyncSession, rows: List[Dict[str, Any]]):
+    # Borrow the asyncpg connection the session's transaction is already using
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        'tracks',
+        records=[tuple(row[column] for column in TRACK_COLUMNS) for row in rows],
+        columns=TRACK_COLUMNS
+    )
@@ -0,0 +1,96 @@
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Recording, Track
+from enrichment_cache import normalize_cache_key
+from bulk_insert import coerce_value
+from schemas import RECORDING_FALLBACK_FIELDS
+
+# Recording fields a track falls back to when its own value is empty
+RECORDING_FIELDS = list(RECORDING_FALLBACK_FIELDS)
+
+# Provider lookup results; kept on the recording only, never copied onto imported tracks
+ENRICHMENT_FIELDS = ['apple_music_url', 'youtube_url', 'spotify_url', 'artwork_url', 'release_year']
+
+# Durations are truncated to whole seconds and grouped into buckets this many seconds wide; tracks in
+# the same bucket are the same recording (edits and remixes usually differ by more)
+DURATION_BUCKET = 2
+
+# IN lists are sent this many values at a time; asyncpg allows 32767 bind parameters per statement
+LOOKUP_CHUNK_SIZE = 500
+
+def _chunks(items: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(items), LOOKUP_CHUNK_SIZE):
+        yield items[start:start + LOOKUP_CHUNK_SIZE]
+
+def track_column(name: str):
+    """Track column for Core selects that outer join Recording, with the catalog fallback applied."""
+    column = getattr(Track, name)
+    if name not in RECORDING_FIELDS:
+        return column
+    # Same rule as TrackResponse: the track's own value unless it is empty
+    own = func.nullif(column, "") if column.type.python_type is str else column
+    return func.coalesce(own, getattr(Recording, name)).label(name)
+
+def recording_fingerprint(artist: str, title: str, duration: Optional[float]) -> str:
+    """Catalog key for a recording: normalized artist and title plus duration bucket."""
+    # Truncated, not rounded: fixed bucket edges, and 200.9 and 201.1 land together
+    seconds = str(int(duration) // DURATION_BUCKET * DURATION_BUCKET) if duration else ""
+    return f"{normalize_cache_key(artist, title)}|{seconds}"
+
+def track_fingerprint(track_data: Dict[str, Any]) -> str:
+    return recording_fingerprint(track_data.get('artist'), track_data.get('title'), track_data.get('duration'))
+
+async def resolve_recordings(db: AsyncSession, tracks: Iterable[Dict[str, Any]]) -> Dict[str, Recording]:
+    """
+    Catalog recordings for a batch of track dicts, keyed by fingerprint. Recordings that don't
+    exist yet are created from the first track that names them. Safe against concurrent imports.
+    """
+    first_seen = {}
+    for track_data in tracks:
+        first_seen.setdefault(track_fingerprint(track_data), track_data)
+    if not first_seen:
+        return {}
+    
+    recordings = await _load_recordings(db, list(first_seen))
+    missing = [fingerprint for fingerprint in first_seen if fingerprint not in recordings]
+    if missing:
+        rows = [_recording_row(fingerprint, first_seen[fingerprint]) for fingerprint in missing]
+        dialect = db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        # Another import may create the same recordings meanwhile; theirs win and are loaded below
+        await db.execute(insert(Recording).on_conflict_do_nothing(index_elements=["fingerprint"]), rows)
+        recordings.update(await _load_recordings(db, missing))
+    return recordings
+
+async def _load_recordings(db: AsyncSession, fingerprints: List[str]) -> Dict[str, Recording]:
+    recordings = {}
+    for chunk in _chunks(fingerprints):
+        result = await db.execute(select(Recording).where(Recording.fingerprint.in_(chunk)))
+        recordings.update((recording.fingerprint, recording) for recording in result.scalars())
+    return recordings
+
+def _recording_row(fingerprint: str, track_data: Dict[str, Any]) -> Dict[str, Any]:
+    row = {
+        field: coerce_value(Recording.__table__, field, track_data.get(field) or None)
+        for field in ['title', 'artist'] + RECORDING_FIELDS
+    }
+    row['fingerprint'] = fingerprint
+    return row
+
+async def relink_tracks(db: AsyncSession, track_ids: List[int]):
+    """Point tracks at the recordings matching their current title, artist and duration."""
+    if not track_ids:
+        return
+    tracks = []
+    for chunk in _chunks(track_ids):
+        result = await db.execute(
+            select(Track.id, Track.title, Track.artist, Track.duration).where(Track.id.in_(chunk))
+        )
+        tracks.extend(dict(row._mapping) for row in result)
+    recordings = await resolve_recordings(db, tracks)
+    await db.execute(
+        update(Track),
+        [{"id": track["id"], "recording_id": recordings[track_fingerprint(track)].id} for track in tracks]
+    )
@@ -0,0 +1,259 @@
+import gzip
+import mimetypes
+import os
+import sys
+import tempfile
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it everything is served gzip only
+    brotli = None
+
+load_dotenv()
+
+# Smaller responses go out as they are; the saving doesn't pay for the compression
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Levels for compressing responses on the fly, kept cheap since it runs on every request
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Levels for payloads compressed once and stored: the public playlist cache and the static build
+PRECOMPRESS_GZIP_LEVEL = int(os.getenv("PRECOMPRESS_GZIP_LEVEL", "9"))
+PRECOMPRESS_BROTLI_QUALITY = int(os.getenv("PRECOMPRESS_BROTLI_QUALITY", "11"))
+
+# Supported content codings, most preferred first, with the suffix of their stored files
+ENCODINGS = {"br": ".br", "gzip": ".gz"} if brotli else {"gzip": ".gz"}
+
+# Media types worth compressing; images, fonts and archives are compressed already
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "application/manifest+json", "image/svg+xml"
+)
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    return bool(media_type) and media_type.startswith(COMPRESSIBLE_TYPES)
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Content coding to send for an Accept-Encoding header, out of the available ones
+    (in preference order). None means send the body as it is.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress(data: bytes, encoding: str, stored: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=PRECOMPRESS_BROTLI_QUALITY if stored else BROTLI_QUALITY)
+    # mtime=0 so the same body always compresses to the same bytes
+    return gzip.compress(data, compresslevel=PRECOMPRESS_GZIP_LEVEL if stored else GZIP_LEVEL, mtime=0)
+
+def precompress(data: bytes) -> Dict[str, bytes]:
+    """Every supported encoding of a payload that is going to be stored, skipping ones that don't shrink it."""
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return {}
+    encoded = {}
+    for encoding in ENCODINGS:
+        compressed = compress(data, encoding, stored=True)
+        if len(compressed) < len(data):
+            encoded[encoding] = compressed
+    return encoded
+
+def precompress_directory(directory: str) -> int:
+    """
+    Write .br and .gz copies next to the compressible files of a static build.
+    Copies newer than their file are kept and files under COMPRESSION_MIN_SIZE are skipped,
+    so this is cheap to repeat; only a file that doesn't shrink is compressed again each time.
+    Each copy is written to a temporary file and renamed into place, so readers never see a
+    partial one. Returns the number written.
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(tuple(ENCODINGS.values())) or not is_compressible(mimetypes.guess_type(name)[0]):
+                continue
+            path = os.path.join(root, name)
+            # precompress() would return nothing for it, so it never gets copies to be up to date with
+            if os.path.getsize(path) < COMPRESSION_MIN_SIZE:
+                continue
+            modified = os.path.getmtime(path)
+            stale = [
+                encoding for encoding, suffix in ENCODINGS.items()
+                if not os.path.exists(path + suffix) or os.path.getmtime(path + suffix) < modified
+            ]
+            if not stale:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            encoded = precompress(data)
+            for encoding in stale:
+                if encoding in encoded:
+                    _write_atomically(path + ENCODINGS[encoding], encoded[encoding])
+                    written += 1
+    return written
+
+def _write_atomically(path: str, data: bytes):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".precompress-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves the stored .br/.gz copy of a file when the client accepts it."""
+    
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self._variants: Optional[Dict[str, Dict[str, Tuple[str, os.stat_result]]]] = None
+    
+    @property
+    def variants(self) -> Dict[str, Dict[str, Tuple[str, os.stat_result]]]:
+        # The build doesn't change while we run, so find the stored copies (and stat them) once.
+        # Not at import: the gunicorn master may still be writing them.
+        if self._variants is None:
+            self._variants = {}
+            for dirpath, _, files in os.walk(os.path.realpath(self.directory)):
+                names = set(files)
+                for name in files:
+                    variants = {
+                        encoding: (os.path.join(dirpath, name + suffix), os.stat(os.path.join(dirpath, name + suffix)))
+                        for encoding, suffix in ENCODINGS.items() if name + suffix in names
+                    }
+                    if variants:
+                        self._variants[os.path.join(dirpath, name)] = variants
+        return self._variants
+    
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        variants = self.variants.get(str(full_path))
+        request_headers = Headers(scope=scope)
+        encoding = variants and negotiate_encoding(request_headers.get("accept-encoding"), variants)
+        if not encoding:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            if variants:
+                response.headers.setdefault("Vary", "Accept-Encoding")
+            return response
+        
+        path, variant_stat = variants[encoding]
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            stat_result=variant_stat,
+            method=scope["method"],
+            media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip on the fly, unless small, incompressible or already encoded."""
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), ENCODINGS)
+            if encoding:
+                await _CompressingResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+class _CompressingResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+    
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows whether to compress
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or not is_compressible(headers.get("content-type"))
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            vary = [token.strip().lower() for token in headers.get("vary", "").split(",")]
+            if "accept-encoding" not in vary:
+                headers.add_vary_header("Accept-Encoding")
+            # The ETag names the uncompressed body
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            message["body"] = self.compress(body) + (b"" if more_body else self.finish())
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+            await self.send(message)
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            message["body"] = self.compress(body) + (b"" if more_body else self.finish())
+            await self.send(message)
+
+if __name__ == "__main__":
+    # Run after building the frontend: python compression.py frontend/build
+    for directory in sys.argv[1:]:
+        print(f"Precompressed {precompress_directory(directory)} files in {directory}")
@@ -1,39 +1,197 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+import asyncio
+import logging
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database URL - defaults to SQLite for development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./spin_playlist.db")
 
-print(f"Database URL: {DATABASE_URL}")  # Debug logging
-
-try:
-    # For production PostgreSQL
-    if DATABASE_URL.startswith("postgresql"):
-        engine = create_engine(DATABASE_URL)
-    else:
-        # SQLite for development
-        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-    
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
-    print("Database connection established successfully")
-    
-except Exception as e:
-    print(f"Database connection error: {e}")
-    # Fallback to in-memory SQLite
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
-    print("Using fallback in-memory database")
-
-def get_db():
-    db = SessionLocal()
-    try:
+# Connection pool settings (PostgreSQL only; SQLite connections are cheap and local)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Reconnect connections older than this many seconds, ahead of server/proxy idle cutoffs
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Connections opened at startup so the first burst doesn't pay for connects
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# Server-side limit for a single statement, in milliseconds (0 disables it)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# Set when DATABASE_URL points at PgBouncer in transaction pooling mode
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+class PoolStats:
+    """Counters for how long checkouts waited on the connection pool."""
+    
+    __slots__ = ("checkouts", "timeouts", "total_wait", "max_wait")
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record(self, waited: float):
+        self.checkouts += 1
+        self.total_wait += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+
+class _TimedPoolMixin:
+    stats: PoolStats
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    stats = PoolStats()
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+def _is_postgres(url: str) -> bool:
+    return url.startswith("postgres")
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Pool and driver options for the sync or async engine."""
+    if not _is_postgres(url):
+        if is_async:
+            return {}
+        return {"connect_args": {"check_same_thread": False}}
+    
+    options = {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+    connect_args = {}
+    if DB_PGBOUNCER:
+        # PgBouncer hands each transaction to any server connection, so prepared
+        # statements can't be cached and startup parameters are rejected
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    elif DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, is_async=False))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+def run_migrations():
+    """
+    Upgrade the schema to the latest Alembic migration. Blocking; safe to run from
+    every worker at once, as the migrations serialize on a database lock.
+    """
+    from alembic import command
+    from alembic.config import Config
+    
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(backend_dir, "alembic.ini"))
+    # Relative to the backend directory, wherever the app was started from
+    config.set_main_option("script_location", os.path.join(backend_dir, "migrations"))
+    # Keep the app's logging configuration
+    config.attributes["configure_logger"] = False
+    # Never log the password
+    logger.info("Migrating %s", make_url(DATABASE_URL).render_as_string(hide_password=True))
+    command.upgrade(config, "head")
+
+def get_async_database_url(url: str) -> str:
+    """Map the configured URL onto an asyncio driver: asyncpg for PostgreSQL, aiosqlite for SQLite."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+# Async engine used by the API so queries don't block the event loop.
+# The sync engine above stays for startup tasks and scripts.
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    # Objects stay usable after commit without lazy (blocking) reloads
+    expire_on_commit=False
+)
+
+if DB_PGBOUNCER and DB_STATEMENT_TIMEOUT_MS and _is_postgres(DATABASE_URL):
+    # Session settings don't survive PgBouncer's connection swapping; scope the timeout to each transaction
+    @event.listens_for(Session, "after_begin")
+    def _set_statement_timeout(session, transaction, connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def warm_up_pool():
+    """Open pooled connections ahead of traffic so a burst at startup doesn't queue on connects."""
+    pool = async_engine.pool
+    if not isinstance(pool, QueuePool) or DB_POOL_WARMUP <= 0:
+        return
+    
+    # Hold every connection until all are open so each one is a separate pool slot
+    count = min(DB_POOL_WARMUP, DB_POOL_SIZE)
+    results = await asyncio.gather(*(async_engine.connect().start() for _ in range(count)), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    for conn in results:
+        if not isinstance(conn, Exception):
+            await conn.close()
+    if failures:
+        logger.warning("Database pool warm-up: %d of %d connections failed: %s", len(failures), count, failures[0])
+
+def pool_metrics() -> dict:
+    """Snapshot of the API connection pool for the pool metrics endpoint."""
+    pool = async_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    
+    stats = pool.stats
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # Negative while the pool is still below its base size
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout_seconds": DB_POOL_TIMEOUT,
+        "checkouts": stats.checkouts,
+        "checkout_timeouts": stats.timeouts,
+        "wait_avg_ms": round(stats.total_wait / stats.checkouts * 1000, 3) if stats.checkouts else 0.0,
+        "wait_max_ms": round(stats.max_wait * 1000, 3)
+    }
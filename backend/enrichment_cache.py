@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models import EnrichmentCacheEntry
+
+load_dotenv()
+
+# How long successful and empty lookups stay cached
+CACHE_HIT_TTL = timedelta(days=int(os.getenv("ENRICHMENT_CACHE_HIT_TTL_DAYS", "30")))
+CACHE_MISS_TTL = timedelta(hours=int(os.getenv("ENRICHMENT_CACHE_MISS_TTL_HOURS", "24")))
+
+# Entries kept in the in-process LRU in front of the enrichment_cache table
+CACHE_MAX_ENTRIES = int(os.getenv("ENRICHMENT_CACHE_MAX_ENTRIES", "2048"))
+
+_memory_cache: "OrderedDict[str, Tuple[Dict[str, Any], datetime]]" = OrderedDict()
+
+def normalize_cache_key(artist: str, title: str) -> str:
+    """Build a cache key that ignores case, accents, punctuation and spacing."""
+    return f"{_normalize(artist)}|{_normalize(title)}"
+
+def _normalize(value: Optional[str]) -> str:
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    value = value.casefold().replace('&', ' and ')
+    value = re.sub(r'[^\w\s]', ' ', value)
+    return ' '.join(value.split())
+
+async def get_cached_enrichment(artist: str, title: str) -> Optional[Dict[str, Any]]:
+    """
+    Return cached lookup results for a track, or None if it must be looked up.
+    An empty dict is a cached miss: the providers had nothing for this track.
+    """
+    key = normalize_cache_key(artist, title)
+    now = datetime.now(timezone.utc)
+    
+    cached = _memory_cache.get(key)
+    if cached is not None:
+        data, expires_at = cached
+        if expires_at > now:
+            _memory_cache.move_to_end(key)
+            return data
+        del _memory_cache[key]
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(EnrichmentCacheEntry).where(EnrichmentCacheEntry.cache_key == key)
+        )
+        entry = result.scalars().first()
+        if not entry:
+            return None
+        
+        expires_at = _as_utc(entry.expires_at)
+        if expires_at <= now:
+            return None
+        
+        data = json.loads(entry.data)
+    
+    _remember(key, data, expires_at)
+    return data
+
+async def store_enrichment(artist: str, title: str, data: Dict[str, Any]):
+    """Cache lookup results for a track; empty results are kept for the shorter miss TTL."""
+    key = normalize_cache_key(artist, title)
+    found = bool(data)
+    expires_at = datetime.now(timezone.utc) + (CACHE_HIT_TTL if found else CACHE_MISS_TTL)
+    _remember(key, data, expires_at)
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            result = await db.execute(
+                select(EnrichmentCacheEntry).where(EnrichmentCacheEntry.cache_key == key)
+            )
+            entry = result.scalars().first()
+            if entry is None:
+                entry = EnrichmentCacheEntry(cache_key=key)
+                db.add(entry)
+            
+            entry.data = json.dumps(data)
+            entry.found = found
+            entry.expires_at = expires_at
+            await db.commit()
+        except IntegrityError:
+            # Another import stored the same track first; its result is just as good
+            await db.rollback()
+
+def _remember(key: str, data: Dict[str, Any], expires_at: datetime):
+    _memory_cache[key] = (data, expires_at)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > CACHE_MAX_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Sequence
+import orjson
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Playlist, Track, Recording
+from schemas import TrackResponse, PlaylistWithTracks
+from catalog import track_column
+from track_order import track_ordering
+
+# Read endpoints build their bodies straight from Core rows instead of hydrating ORM
+# objects and validating them through the response models. Fields keep the models'
+# order and formats, so the bytes are the same as before.
+TRACK_FIELDS = list(TrackResponse.model_fields)
+PLAYLIST_FIELDS = [name for name in PlaylistWithTracks.model_fields if name != "tracks"]
+PLAYLIST_COLUMNS = [getattr(Playlist, name) for name in PLAYLIST_FIELDS]
+
+# Pydantic writes UTC datetimes with a Z suffix
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson; also takes a body already encoded with dumps()."""
+    
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+async def load_tracks(db: AsyncSession, *conditions) -> Dict[int, List[Dict[str, Any]]]:
+    """Track dicts matching the conditions, grouped by playlist in play order, with ordinal positions."""
+    result = await db.execute(
+        select(Track.playlist_id, *(track_column(name) for name in TRACK_FIELDS)).outerjoin(
+            Recording, Track.recording_id == Recording.id
+        ).where(*conditions).order_by(Track.playlist_id, *track_ordering())
+    )
+    tracks = {}
+    for playlist_id, *values in result:
+        playlist_tracks = tracks.setdefault(playlist_id, [])
+        track = dict(zip(TRACK_FIELDS, values))
+        # Stored positions are sparse sort keys; report each track's place in the list
+        track["position"] = len(playlist_tracks) + 1
+        playlist_tracks.append(track)
+    return tracks
+
+async def with_tracks(db: AsyncSession, rows: Sequence) -> List[Dict[str, Any]]:
+    """Playlist dicts for rows selected with PLAYLIST_COLUMNS, each with its tracks, in one extra query."""
+    playlists = [dict(zip(PLAYLIST_FIELDS, row)) for row in rows]
+    if playlists:
+        tracks = await load_tracks(db, Track.playlist_id.in_([playlist["id"] for playlist in playlists]))
+        for playlist in playlists:
+            playlist["tracks"] = tracks.get(playlist["id"], [])
+    return playlists
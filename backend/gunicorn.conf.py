@@ -0,0 +1,91 @@
+# Production server: gunicorn managing uvicorn workers.
+#   gunicorn -c gunicorn.conf.py main:app
+# SIGHUP restarts workers gracefully. With the app preloaded they keep the code the master
+# loaded, so deploy code with a full restart (or SIGUSR2 then SIGQUIT to the old master).
+import glob
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Workers write their metrics here and /metrics sums them; set before the app (and
+# prometheus_client) is imported. One directory per gunicorn instance on the host.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "spin_playlist_metrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def _available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and a cgroup v2 quota (containers)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Async workers each serve many requests at once, so one per CPU. Each has its own
+# database pool: keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) under the server's limit.
+# Provider rate limits, the YouTube daily quota and IMPORT_WORKERS are held in process
+# memory too; they are deployment totals that post_fork splits evenly between the workers.
+# With several hosts, divide them by the host count as well.
+workers = int(os.getenv("WEB_CONCURRENCY", str(_available_cpus())))
+worker_class = "workers.AppWorker"
+
+# Pending connections the kernel queues while every worker is busy
+backlog = int(os.getenv("GUNICORN_BACKLOG", "2048"))
+# Idle keep-alive seconds; longer than the load balancer's so it never reuses a closed connection
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+# A worker whose event loop is stuck this long is killed and replaced
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# In-flight requests get this long to finish on shutdown or reload
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Recycle workers after this many requests (0 never), jittered so they don't restart together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+# Import the app once in the master so workers fork ready to serve. Importing main opens
+# no connections and starts no threads, so nothing unsafe is shared across the fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+def post_fork(server, worker):
+    from metadata_enrichment import share_limits_between
+    from import_jobs import share_workers_between
+    
+    share_limits_between(server.num_workers)
+    share_workers_between(server.num_workers)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    
+    # Its counts stay in the totals; only its live gauges go
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_starting(server):
+    # Start the metrics from zero; not at config load, which a SIGHUP reload repeats under running workers
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+    
+    if not preload_app:
+        # Each worker prepares the database in its lifespan instead (serialized by the migration
+        # lock); stored static copies then come from the image build only
+        return
+    import main
+    from database import engine
+    
+    # Migrations and seeding once, in the master, before any worker starts
+    main.prepare_database()
+    main.database_prepared = True
+    # Also once, before any worker serves a static file (a no-op if the image build did it)
+    main.precompress_frontend()
+    # Workers must open their own connections rather than inherit the master's
+    engine.dispose()
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import ImportJob, Playlist, Recording
+from schemas import XMLImportJobResponse, XMLImportResult
+from xml_parser import parse_playlist_xml
+from metadata_enrichment import enrich_tracks_metadata
+from bulk_insert import bulk_insert_tracks, coerce_value
+from catalog import resolve_recordings, track_fingerprint, RECORDING_FIELDS, ENRICHMENT_FIELDS
+from track_order import position_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Where uploads wait for a worker; must be shared by all app processes on the host
+IMPORT_UPLOAD_DIR = os.getenv("IMPORT_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "spin_playlist_imports"))
+
+# Number of imports processed at the same time across the deployment's app processes
+# (each gunicorn worker runs its share, at least one; see share_workers_between)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# Tracks are bulk inserted, and progress written back, in batches of this size
+INSERT_BATCH_SIZE = int(os.getenv("IMPORT_INSERT_BATCH_SIZE", "500"))
+
+# A running job touches updated_at this often; one left untouched for IMPORT_STALE_SECONDS
+# belongs to a process that died (deploy, crash, worker recycle) and is marked failed
+IMPORT_HEARTBEAT_SECONDS = float(os.getenv("IMPORT_HEARTBEAT_SECONDS", "30"))
+IMPORT_STALE_SECONDS = float(os.getenv("IMPORT_STALE_SECONDS", "300"))
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+def share_workers_between(processes: int):
+    """Run this process's share of the import workers when `processes` app processes run side by side."""
+    global IMPORT_WORKERS
+    IMPORT_WORKERS = max(IMPORT_WORKERS // processes, 1)
+
+async def start_import_workers():
+    """Start the import worker pool and pick up jobs that were queued before a restart."""
+    global _queue
+    _queue = asyncio.Queue()
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(IMPORT_WORKERS))
+    _workers.append(asyncio.create_task(_sweep_stale_jobs()))
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ImportJob.id).where(ImportJob.status == "queued").order_by(ImportJob.id)
+        )
+        queued = result.scalars().all()
+    for job_id in queued:
+        _queue.put_nowait(job_id)
+
+async def stop_import_workers():
+    """Cancel the import workers; interrupted jobs are failed once their heartbeat goes stale."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+async def enqueue_import(
+    db: AsyncSession,
+    file: UploadFile,
+    admin_id: int,
+    class_date: Optional[datetime] = None
+) -> ImportJob:
+    """Store an uploaded playlist file and queue it for import; class_date is used if the file has no date."""
+    os.makedirs(IMPORT_UPLOAD_DIR, exist_ok=True)
+    fd, upload_path = tempfile.mkstemp(suffix=".xml", dir=IMPORT_UPLOAD_DIR)
+    with os.fdopen(fd, "wb") as out:
+        await run_in_threadpool(shutil.copyfileobj, file.file, out)
+    
+    job = ImportJob(
+        created_by=admin_id,
+        filename=file.filename,
+        upload_path=upload_path,
+        status="queued",
+        class_date=class_date
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job, attribute_names=["created_at", "updated_at"])
+    
+    if _queue is not None:
+        _queue.put_nowait(job.id)
+    return job
+
+def job_to_response(job: ImportJob) -> XMLImportJobResponse:
+    return XMLImportJobResponse(
+        job_id=job.id,
+        status=job.status,
+        filename=job.filename,
+        tracks_parsed=job.tracks_parsed or 0,
+        tracks_enriched=job.tracks_enriched or 0,
+        tracks_inserted=job.tracks_inserted or 0,
+        result=XMLImportResult(**json.loads(job.result)) if job.result else None,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_import_job(job_id)
+        except Exception:
+            logger.exception("Import job %s crashed", job_id)
+        finally:
+            _queue.task_done()
+
+async def _sweep_stale_jobs():
+    while True:
+        try:
+            await fail_stale_jobs()
+        except Exception:
+            logger.exception("Sweeping stale import jobs failed")
+        await asyncio.sleep(IMPORT_STALE_SECONDS / 2)
+
+async def fail_stale_jobs() -> int:
+    """Mark running jobs whose heartbeat stopped as failed and delete their uploads. Returns how many."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=IMPORT_STALE_SECONDS)
+    stale = and_(
+        ImportJob.status == "running",
+        or_(ImportJob.updated_at < cutoff, and_(ImportJob.updated_at.is_(None), ImportJob.created_at < cutoff))
+    )
+    # Not re-queued: the playlist was created when the job started, so a rerun would duplicate it
+    result = XMLImportResult(
+        success=False,
+        message="Import failed: it was interrupted by a server restart; the playlist may be incomplete",
+        errors=["Import interrupted"]
+    )
+    async with AsyncSessionLocal() as db:
+        jobs = (await db.execute(select(ImportJob.id, ImportJob.upload_path).where(stale))).all()
+        if not jobs:
+            return 0
+        await db.execute(
+            update(ImportJob).where(ImportJob.id.in_([job.id for job in jobs]), stale).values(
+                status="failed", result=result.model_dump_json()
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+    
+    for job in jobs:
+        logger.warning("Import job %s was interrupted; marked failed", job.id)
+        if job.upload_path:
+            try:
+                os.remove(job.upload_path)
+            except OSError:
+                pass
+    return len(jobs)
+
+async def _heartbeat(job_id: int):
+    """Touch a running job's updated_at so other processes can tell it is still alive."""
+    while True:
+        await asyncio.sleep(IMPORT_HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ImportJob).where(ImportJob.id == job_id, ImportJob.status == "running").values(
+                        updated_at=func.now()
+                    ),
+                    execution_options={"synchronize_session": False}
+                )
+                await db.commit()
+        except Exception as e:
+            # A missed beat is harmless; only a run of them marks the job stale
+            logger.warning("Import job %s heartbeat failed: %s", job_id, e)
+
+async def run_import_job(job_id: int):
+    """Parse, enrich and insert one queued import, recording progress on the job row."""
+    async with AsyncSessionLocal() as db:
+        # Claim the job atomically so only one worker process runs it
+        claimed = await db.execute(
+            update(ImportJob).where(
+                ImportJob.id == job_id,
+                ImportJob.status == "queued"
+            ).values(status="running"),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+        if not claimed.rowcount:
+            return
+        
+        job = await db.get(ImportJob, job_id)
+        upload_path = job.upload_path
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+        try:
+            result = await _import_playlist(db, job)
+            job.status = "completed" if result.success else "failed"
+        except Exception as e:
+            await db.rollback()
+            result = XMLImportResult(
+                success=False,
+                message=f"Import failed: {str(e)}",
+                errors=[str(e)]
+            )
+            job.status = "failed"
+        finally:
+            heartbeat.cancel()
+        
+        job.result = result.model_dump_json()
+        await db.commit()
+        
+        if upload_path:
+            try:
+                os.remove(upload_path)
+            except OSError:
+                pass
+
+async def _import_playlist(db: AsyncSession, job: ImportJob) -> XMLImportResult:
+    with open(job.upload_path, "rb") as upload:
+        # Parsing is CPU-bound (the generic format reads the whole tree); keep it off the event loop
+        parsed_data = await run_in_threadpool(parse_playlist_xml, upload)
+        class_date = parsed_data.get('class_date') or job.class_date
+        if class_date is None:
+            raise ValueError("The file has no date; choose a class date and import it again")
+        
+        # Create playlist
+        playlist = Playlist(
+            title=parsed_data.get('title', f'Imported Playlist - {job.filename}'),
+            description=parsed_data.get('description', ''),
+            class_date=class_date,
+            created_by=job.created_by
+        )
+        db.add(playlist)
+        await db.commit()
+        
+        # Add tracks a batch at a time: link each to its catalog recording, enrich only
+        # recordings the catalog hasn't seen before, then bulk insert the playlist entries
+        tracks_imported = 0
+        errors = []
+        
+        # iTunes libraries stream their tracks; each batch is pulled from the parser on the threadpool
+        batches = _batches(parsed_data.get('tracks', []), INSERT_BATCH_SIZE)
+        while True:
+            batch = await run_in_threadpool(next, batches, None)
+            if batch is None:
+                break
+            job.tracks_parsed += len(batch)
+            recordings = await resolve_recordings(db, batch)
+            # New catalog entries stand on their own; don't hold the write lock through enrichment
+            await db.commit()
+            await _enrich_recordings(recordings.values(), errors)
+            job.tracks_enriched += len(batch)
+            
+            rows = []
+            for track_data in batch:
+                # iTunes libraries carry no position, so fall back to file order
+                ordinal = track_data.get('position') or tracks_imported + len(rows) + 1
+                row = {field: value for field, value in track_data.items() if field not in ENRICHMENT_FIELDS}
+                row['position'] = position_key(ordinal)
+                row['recording_id'] = recordings[track_fingerprint(track_data)].id
+                rows.append(row)
+            
+            tracks_imported += await bulk_insert_tracks(db, playlist.id, rows)
+            job.tracks_inserted = tracks_imported
+            await db.commit()
+    
+    return XMLImportResult(
+        success=True,
+        message=f"Successfully imported {tracks_imported} tracks",
+        playlist_id=playlist.id,
+        tracks_imported=tracks_imported,
+        errors=errors
+    )
+
+async def _enrich_recordings(recordings: Iterable[Recording], errors: List[str]):
+    by_id = {recording.id: recording for recording in recordings if recording.enriched_at is None}
+    lookups = (
+        {'recording_id': recording.id, 'title': recording.title, 'artist': recording.artist, 'youtube_url': recording.youtube_url}
+        for recording in by_id.values()
+    )
+    async for track_data, enriched_data, skipped, error in enrich_tracks_metadata(lookups):
+        if error is not None:
+            errors.append(f"Error enriching track {track_data.get('title', 'Unknown')}: {str(error)}")
+            continue
+        
+        for note in skipped:
+            errors.append(f"Track {track_data.get('title', 'Unknown')}: {note}")
+        
+        recording = by_id[track_data['recording_id']]
+        for field in RECORDING_FIELDS:
+            # Values from the uploaded file win over provider results
+            if getattr(recording, field) in (None, '') and enriched_data.get(field) not in (None, ''):
+                setattr(recording, field, coerce_value(Recording.__table__, field, enriched_data[field]))
+        # Skipped lookups are retried by the next import that uses this recording
+        if not skipped:
+            recording.enriched_at = datetime.now(timezone.utc)
+
+def _batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,74 +1,109 @@
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Union, BinaryIO
+import io
 import re
 
+# Number of bytes read from the start of an upload to detect its format
+SNIFF_BYTES = 8192
+
+_XML_COMMENT_RE = re.compile(rb'<!--.*?-->', re.DOTALL)
+_ROOT_TAG_RE = re.compile(rb'<(?![?!])([A-Za-z_][\w.:-]*)')
+_PLIST_KEY_RE = re.compile(rb'<key>([^<]*)</key>')
+
 def parse_itunes_library_xml(xml_content: bytes) -> Dict[str, Any]:
     """
     Parse iTunes Library XML file (plist format) and extract playlist and track information.
     This handles the specific structure used by iTunes library exports.
     """
+    result = stream_itunes_library_xml(xml_content)
+    result['tracks'] = list(result['tracks'])
+    return result
+
+def stream_itunes_library_xml(source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+    """
+    Incrementally parse an iTunes Library XML file with iterparse.
+    The library header is read eagerly; 'tracks' is a generator yielding
+    parse_track_dict results one at a time, clearing each element once consumed
+    so memory stays flat regardless of library size.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    
+    context = ET.iterparse(source, events=('start', 'end'))
+    stack = []
+    main_dict = None
+    tracks_dict = None
+    library_info = {}
+    pending_key = None
+    
     try:
-        root = ET.fromstring(xml_content)
+        for event, elem in context:
+            if event == 'start':
+                stack.append(elem)
+                if len(stack) == 1 and elem.tag != 'plist':
+                    raise ValueError("Not a valid iTunes library file (missing plist root)")
+                if len(stack) == 2 and main_dict is None and elem.tag == 'dict':
+                    main_dict = elem
+                elif len(stack) == 3 and stack[1] is main_dict and pending_key == 'Tracks' and elem.tag == 'dict':
+                    # Stop here; the tracks themselves are consumed lazily below
+                    tracks_dict = elem
+                    break
+                continue
+            
+            stack.pop()
+            if main_dict is not None and len(stack) == 2 and stack[1] is main_dict:
+                # Direct child of the main dict: alternating key/value elements
+                if elem.tag == 'key':
+                    pending_key = elem.text
+                else:
+                    library_info[pending_key] = parse_plist_value(elem)
+                    pending_key = None
+                main_dict.clear()
     except ET.ParseError as e:
         raise ValueError(f"Invalid XML format: {str(e)}")
     
-    # Verify this is an iTunes library file
-    if root.tag != 'plist':
-        raise ValueError("Not a valid iTunes library file (missing plist root)")
+    if main_dict is None:
+        raise ValueError("Invalid iTunes library structure")
+    if tracks_dict is None:
+        raise ValueError("No tracks found in iTunes library")
     
     result = {
         'title': 'iTunes Library Import',
         'description': 'Imported from iTunes Library',
         'class_date': None,
-        'tracks': []
+        'tracks': _iter_track_elements(context, tracks_dict)
     }
     
-    # Find the main dict element
-    main_dict = root.find('dict')
-    if main_dict is None:
-        raise ValueError("Invalid iTunes library structure")
-    
-    # Extract library metadata
-    library_info = parse_dict_element(main_dict)
-    
     # Extract the date if available
     if 'Date' in library_info:
         result['class_date'] = parse_itunes_date(library_info['Date'])
     
-    # Find tracks section
-    tracks_dict = None
-    for i, child in enumerate(main_dict):
-        if child.tag == 'key' and child.text == 'Tracks':
-            # Next element should be the tracks dict
-            if i + 1 < len(main_dict):
-                tracks_dict = main_dict[i + 1]
-            break
-    
-    if tracks_dict is None or tracks_dict.tag != 'dict':
-        raise ValueError("No tracks found in iTunes library")
-    
-    # Parse all tracks
-    tracks = []
-    track_elements = []
-    
-    # Collect all track elements (they're key-value pairs)
-    for i, child in enumerate(tracks_dict):
-        if child.tag == 'key':
-            # This is a track ID, next element should be the track dict
-            if i + 1 < len(tracks_dict):
-                track_dict = tracks_dict[i + 1]
-                if track_dict.tag == 'dict':
-                    track_elements.append(track_dict)
-    
-    for track_dict in track_elements:
-        track_data = parse_track_dict(track_dict)
-        if track_data:
-            tracks.append(track_data)
-    
-    result['tracks'] = tracks
     return result
 
+def _iter_track_elements(context, tracks_dict) -> Iterator[Dict[str, Any]]:
+    """Yield parsed tracks from the remaining iterparse events of the Tracks dict."""
+    depth = 0
+    try:
+        for event, elem in context:
+            if event == 'start':
+                depth += 1
+                continue
+            
+            if depth == 0:
+                # End of the Tracks dict; playlists that follow are not needed
+                break
+            
+            depth -= 1
+            if depth == 0 and elem.tag == 'dict':
+                track_data = parse_track_dict(elem)
+                # Drop the track ID key and track dict we just consumed
+                tracks_dict.clear()
+                if track_data:
+                    yield track_data
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid XML format: {str(e)}")
+
 def parse_dict_element(dict_elem) -> Dict[str, Any]:
     """Parse a dict element from plist format into a Python dictionary."""
     result = {}
@@ -77,7 +112,7 @@ def parse_dict_element(dict_elem) -> Dict[str, Any]:
     for i in range(0, len(children), 2):
         if i + 1 >= len(children):
             break
-            
+        
         key_elem = children[i]
         value_elem = children[i + 1]
         
@@ -158,32 +193,34 @@ def parse_track_dict(track_dict) -> Optional[Dict[str, Any]]:
     
     return track_data
 
-def parse_itunes_date(date_str: str) -> Optional[str]:
-    """Parse iTunes date format to ISO date string."""
+def parse_itunes_date(date_str: str) -> Optional[datetime]:
+    """Parse iTunes date format to the start of that day."""
     try:
         # iTunes dates are in ISO format: 2024-10-03T18:16:12Z
         dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        return dt.strftime('%Y-%m-%d')
+        return datetime(dt.year, dt.month, dt.day)
     except (ValueError, AttributeError):
         return None
 
-def detect_itunes_library(xml_content: bytes) -> bool:
-    """Check if the XML content is an iTunes library file."""
-    try:
-        root = ET.fromstring(xml_content)
-        if root.tag != 'plist':
-            return False
-        
-        # Check for iTunes-specific elements
-        main_dict = root.find('dict')
-        if main_dict is None:
-            return False
-        
-        library_info = parse_dict_element(main_dict)
-        
-        # Check for iTunes-specific keys
-        itunes_keys = ['Application Version', 'Library Persistent ID', 'Tracks']
-        return any(key in library_info for key in itunes_keys)
-        
-    except Exception:
+def detect_itunes_library(xml_head: bytes) -> bool:
+    """
+    Check if the XML content is an iTunes library file.
+    Only the first SNIFF_BYTES are inspected: the root tag, the plist DOCTYPE
+    and the first top-level keys, so the document is never parsed here.
+    """
+    head = xml_head[:SNIFF_BYTES]
+    if sniff_root_tag(head) != 'plist' and b'<!DOCTYPE plist' not in head:
         return False
+    
+    # Check for iTunes-specific keys
+    itunes_keys = {'Application Version', 'Library Persistent ID', 'Tracks'}
+    keys = {key.decode('utf-8', 'replace').strip() for key in _PLIST_KEY_RE.findall(head)}
+    return bool(itunes_keys & keys)
+
+def sniff_root_tag(xml_head: bytes) -> Optional[str]:
+    """Return the name of the root element from the start of an XML document."""
+    head = _XML_COMMENT_RE.sub(b'', xml_head)
+    match = _ROOT_TAG_RE.search(head)
+    if not match:
+        return None
+    return match.group(1).decode('utf-8', 'replace')
@@ -1,39 +1,61 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import secrets
 import uvicorn
 import os
 from dotenv import load_dotenv
 
-from database import get_db, engine
-from models import Base
+from database import engine, async_engine, get_async_db, run_migrations, warm_up_pool, pool_metrics
 from auth import get_current_admin
 from routers import auth, playlists, tracks, calendar
+from metadata_enrichment import open_http_client, close_http_client
+from import_jobs import start_import_workers, stop_import_workers
+from fast_json import FastJSONResponse
+from compression import CompressionMiddleware, PrecompressedStaticFiles, precompress_directory
+from metrics import MetricsMiddleware, instrument_engine, metrics_response
 
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+)
+# httpx logs every outbound enrichment lookup at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Set to false when a release step runs `alembic upgrade head` before the app starts
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+FRONTEND_BUILD = "./frontend/build"
+# Bearer token for /metrics and /api/health/pool; unset keeps them switched off
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Set by the gunicorn master once it has prepared the database for all its workers
+database_prepared = False
 
 # Create initial admin user if it doesn't exist
 def create_initial_admin():
     from sqlalchemy.orm import Session
     from models import Admin
-    from auth import get_password_hash, get_admin_by_email
+    from auth import get_password_hash
     
     db = Session(bind=engine)
     try:
         # Check if admin already exists
         admin_email = os.getenv("ADMIN_EMAIL", "admin@example.com")
-        existing_admin = get_admin_by_email(db, admin_email)
+        existing_admin = db.query(Admin).filter(Admin.email == admin_email).first()
         
         if not existing_admin:
             # Create initial admin with very short password to avoid bcrypt issues
             admin_password = os.getenv("ADMIN_PASSWORD", "admin")
-            print(f"Creating admin with password length: {len(admin_password.encode('utf-8'))} bytes")
+            logger.debug("Creating admin with password length: %d bytes", len(admin_password.encode('utf-8')))
             hashed_password = get_password_hash(admin_password)
             
             admin = Admin(
@@ -43,23 +65,54 @@ def create_initial_admin():
             db.add(admin)
             db.commit()
             db.refresh(admin)
-            print(f"Created initial admin user: {admin_email} with ID: {admin.id}")
+            logger.info("Created initial admin user: %s with ID: %s", admin_email, admin.id)
         else:
-            print(f"Admin user already exists: {admin_email}")
-    except Exception as e:
-        print(f"Error creating admin user: {e}")
-        import traceback
-        traceback.print_exc()
+            logger.info("Admin user already exists: %s", admin_email)
+    except IntegrityError:
+        # Another worker starting at the same time created it first
+        db.rollback()
+        logger.info("Admin user already exists: %s", admin_email)
+    except Exception:
+        logger.exception("Error creating admin user")
     finally:
         db.close()
 
-# Create initial admin user
-create_initial_admin()
+def prepare_database():
+    """Bring the schema up to date and seed the initial admin. Idempotent; every worker runs it."""
+    if RUN_MIGRATIONS_ON_STARTUP:
+        run_migrations()
+    create_initial_admin()
+
+def precompress_frontend():
+    """Store .br/.gz copies of the frontend build. Run once per deployment, not per worker."""
+    if not os.path.exists(FRONTEND_BUILD):
+        return
+    # Normally done at image build time already, in which case this only checks timestamps
+    precompressed = precompress_directory(FRONTEND_BUILD)
+    if precompressed:
+        logger.info("Precompressed %d frontend files", precompressed)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup work happens here rather than at import, off the event loop
+    if not database_prepared:
+        await asyncio.to_thread(prepare_database)
+    # Pooled HTTP client shared by all metadata enrichment lookups
+    await open_http_client()
+    await warm_up_pool()
+    await start_import_workers()
+    yield
+    await stop_import_workers()
+    await close_http_client()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Spin Playlist Manager",
     description="Calendar-first playlist publishing for spin instructors",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Model responses are encoded with orjson instead of the stdlib encoder
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -70,22 +123,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination metadata for playlist listings
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+# Compress API responses for attendees on gym Wi-Fi and cellular
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latencies include compression and every other middleware
+app.add_middleware(MetricsMiddleware)
+# Statement timings and per-request query counts, for the API and for startup and import work
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # Health check endpoint FIRST (before catch-all route)
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "message": "Spin Playlist Manager API is running"}
 
+monitoring_bearer = HTTPBearer(auto_error=False)
+
+def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(monitoring_bearer)):
+    # Monitoring isn't part of the public API: 404 when it is switched off, 401 without the token
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(credentials.credentials, METRICS_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Connection pool usage: checked-out connections, overflow and checkout wait times
+@app.get("/api/health/pool", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def pool_health():
+    return pool_metrics()
+
+# Prometheus scrape target: request latency and query counts per route, query and enrichment timings
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    return metrics_response()
+
 # Debug endpoint to check admin users
 @app.get("/api/debug/admins")
-async def debug_admins():
-    from sqlalchemy.orm import Session
+async def debug_admins(db: AsyncSession = Depends(get_async_db)):
     from models import Admin
     
-    db = Session(bind=engine)
     try:
-        admins = db.query(Admin).all()
+        result = await db.execute(select(Admin))
+        admins = result.scalars().all()
         admin_list = []
         for admin in admins:
             admin_list.append({
@@ -98,41 +184,36 @@ async def debug_admins():
         return {"admins": admin_list, "count": len(admin_list)}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        db.close()
 
 # Emergency admin creation endpoint
 @app.post("/api/debug/create-admin")
-async def create_admin_emergency():
-    from sqlalchemy.orm import Session
+async def create_admin_emergency(db: AsyncSession = Depends(get_async_db)):
     from models import Admin
-    from auth import get_password_hash
+    from auth import hash_password
     
-    db = Session(bind=engine)
     try:
         # Check if admin already exists
-        existing_admin = db.query(Admin).filter(Admin.email == "admin@example.com").first()
+        result = await db.execute(select(Admin).where(Admin.email == "admin@example.com"))
+        existing_admin = result.scalars().first()
         if existing_admin:
             return {"message": "Admin already exists", "admin_id": existing_admin.id}
         
         # Create admin with very short password
         password = "admin"
-        print(f"Emergency admin creation with password length: {len(password.encode('utf-8'))} bytes")
-        hashed_password = get_password_hash(password)
+        logger.debug("Emergency admin creation with password length: %d bytes", len(password.encode('utf-8')))
+        hashed_password = await hash_password(password)
         
         admin = Admin(
             email="admin@example.com",
             hashed_password=hashed_password
         )
         db.add(admin)
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
         
         return {"message": "Admin created successfully", "admin_id": admin.id, "email": admin.email}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        db.close()
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
@@ -141,17 +222,21 @@ app.include_router(tracks.router, prefix="/api/tracks", tags=["tracks"])
 app.include_router(calendar.router, prefix="/api/calendar", tags=["calendar"])
 
 # Serve static files (React build) - LAST to avoid intercepting API routes
-if os.path.exists("./frontend/build"):
-    app.mount("/static", StaticFiles(directory="./frontend/build/static"), name="static")
+if os.path.exists(FRONTEND_BUILD):
+    # Stored .br/.gz copies are served as they are
+    app.mount("/static", PrecompressedStaticFiles(directory=f"{FRONTEND_BUILD}/static"), name="static")
+    frontend_build = PrecompressedStaticFiles(directory=FRONTEND_BUILD)
     
     @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
+    async def serve_react_app(full_path: str, request: Request):
         # Serve React app for all non-API routes
         if not full_path.startswith("api/"):
-            return FileResponse("./frontend/build/index.html")
+            return await frontend_build.get_response("index.html", request.scope)
         else:
             raise HTTPException(status_code=404, detail="Not found")
 
 if __name__ == "__main__":
+    # Development server, one process; production runs gunicorn with gunicorn.conf.py
     port = int(os.getenv("PORT", 8000))
+    precompress_frontend()
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -1,64 +1,198 @@
+import asyncio
 import httpx
+import logging
 import os
-from typing import Dict, Any, Optional
+import random
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Iterable, AsyncIterator, Tuple, List
 from dotenv import load_dotenv
+from enrichment_cache import get_cached_enrichment, store_enrichment
+from rate_limit import TokenBucket, QuotaBudget, RateLimitExceeded
+from metrics import ENRICHMENT_DURATION
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # API Keys
 ITUNES_API_BASE = "https://itunes.apple.com/search"
 YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3/search"
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+# Maximum number of tracks enriched at the same time during imports
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+
+# Connection pool and timeouts for the shared lookup client
+HTTP_MAX_CONNECTIONS = int(os.getenv("ENRICHMENT_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ENRICHMENT_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ENRICHMENT_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("ENRICHMENT_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("ENRICHMENT_HTTP_TIMEOUT", "10"))
+
+# Outbound rate limits per provider, for the whole deployment: gunicorn workers each get an
+# equal share (see share_limits_between). Apple allows roughly 20 searches a minute.
+ITUNES_RATE_PER_MINUTE = float(os.getenv("ITUNES_RATE_PER_MINUTE", "20"))
+ITUNES_BURST = int(os.getenv("ITUNES_BURST", "5"))
+YOUTUBE_RATE_PER_MINUTE = float(os.getenv("YOUTUBE_RATE_PER_MINUTE", "60"))
+YOUTUBE_BURST = int(os.getenv("YOUTUBE_BURST", "10"))
+
+# YouTube Data API daily quota (shared out like the rate limits) and the cost of one search.list call
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_SEARCH_COST = 100
+
+# Longest a lookup may queue for its rate limit slot before it is skipped
+LOOKUP_MAX_WAIT = float(os.getenv("ENRICHMENT_MAX_QUEUE_WAIT", "120"))
+
+# Retries with exponential backoff when a provider answers 429/503
+LOOKUP_MAX_RETRIES = int(os.getenv("ENRICHMENT_MAX_RETRIES", "2"))
+LOOKUP_BACKOFF_BASE = float(os.getenv("ENRICHMENT_BACKOFF_BASE", "2"))
+
+itunes_rate_limiter = TokenBucket(ITUNES_RATE_PER_MINUTE, ITUNES_BURST)
+youtube_rate_limiter = TokenBucket(YOUTUBE_RATE_PER_MINUTE, YOUTUBE_BURST)
+youtube_quota = QuotaBudget(YOUTUBE_DAILY_QUOTA)
+
+def share_limits_between(processes: int):
+    """Limit this process to its share of the provider budgets when `processes` workers run side by side."""
+    global itunes_rate_limiter, youtube_rate_limiter, youtube_quota
+    itunes_rate_limiter = TokenBucket(ITUNES_RATE_PER_MINUTE / processes, max(ITUNES_BURST // processes, 1))
+    youtube_rate_limiter = TokenBucket(YOUTUBE_RATE_PER_MINUTE / processes, max(YOUTUBE_BURST // processes, 1))
+    youtube_quota = QuotaBudget(YOUTUBE_DAILY_QUOTA // processes)
+
+class LookupSkipped(Exception):
+    """A provider lookup was deliberately not made (rate limit or quota), as opposed to failing."""
+
+# Shared by every lookup so connections are reused; opened and closed with the app lifespan
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (installed by httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+async def open_http_client() -> httpx.AsyncClient:
+    """Create the shared enrichment HTTP client if it isn't open yet."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared enrichment HTTP client and its pooled connections."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 async def enrich_track_metadata(track_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Enrich track metadata by searching iTunes/Apple Music and YouTube APIs.
+    Lookups are cached by normalized artist/title, so repeat tracks make no outbound calls.
+    """
+    enriched_data, _ = await enrich_track_metadata_with_status(track_data)
+    return enriched_data
+
+async def enrich_track_metadata_with_status(track_data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Same as enrich_track_metadata, but also returns a note for every provider
+    lookup that was skipped because of rate limits or an exhausted quota.
     """
     enriched_data = track_data.copy()
+    skipped = []
+    
+    cached = await get_cached_enrichment(track_data['artist'], track_data['title'])
+    if cached is not None:
+        enriched_data.update(cached)
+        return enriched_data, skipped
+    
+    lookup_data = {}
+    lookup_failed = False
     
     # Search iTunes/Apple Music first
-    itunes_data = await search_itunes(track_data['title'], track_data['artist'])
-    if itunes_data:
-        enriched_data.update(itunes_data)
+    try:
+        itunes_data = await _timed_lookup("itunes", _lookup_itunes, track_data['title'], track_data['artist'])
+        if itunes_data:
+            lookup_data.update(itunes_data)
+    except LookupSkipped as e:
+        skipped.append(f"iTunes lookup skipped: {e}")
+        lookup_failed = True
+    except Exception as e:
+        logger.warning("iTunes search error: %s", e)
+        lookup_failed = True
     
     # Search YouTube if we don't have a link yet
-    if not enriched_data.get('youtube_url') and YOUTUBE_API_KEY:
-        youtube_data = await search_youtube(track_data['title'], track_data['artist'])
-        if youtube_data:
-            enriched_data.update(youtube_data)
+    if not track_data.get('youtube_url') and not lookup_data.get('youtube_url') and YOUTUBE_API_KEY:
+        try:
+            youtube_data = await _timed_lookup("youtube", _lookup_youtube, track_data['title'], track_data['artist'])
+            if youtube_data:
+                lookup_data.update(youtube_data)
+        except LookupSkipped as e:
+            skipped.append(f"YouTube lookup skipped: {e}")
+            lookup_failed = True
+        except Exception as e:
+            logger.warning("YouTube search error: %s", e)
+            lookup_failed = True
     
-    return enriched_data
+    # Don't let a transient provider error or a skipped lookup be remembered as a miss
+    if not lookup_failed:
+        await store_enrichment(track_data['artist'], track_data['title'], lookup_data)
+    
+    enriched_data.update(lookup_data)
+    return enriched_data, skipped
+
+async def enrich_tracks_metadata(
+    tracks: Iterable[Dict[str, Any]],
+    concurrency: int = ENRICHMENT_CONCURRENCY
+) -> AsyncIterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]], List[str], Optional[Exception]]]:
+    """
+    Enrich many tracks concurrently with at most `concurrency` lookups in flight.
+    Yields (track_data, enriched_data, skipped, error) in the original track order;
+    enriched_data is None exactly when error is set, and skipped lists provider
+    lookups that were not made. `tracks` is consumed lazily, so it may be a
+    generator over a streamed library.
+    """
+    pending = deque()
+    try:
+        for track_data in tracks:
+            pending.append((track_data, asyncio.ensure_future(enrich_track_metadata_with_status(track_data))))
+            if len(pending) >= max(concurrency, 1):
+                yield await _next_enrichment_result(pending)
+        
+        while pending:
+            yield await _next_enrichment_result(pending)
+    finally:
+        # The consumer stopped early; don't leave lookups running in the background
+        for _, task in pending:
+            task.cancel()
+
+async def _next_enrichment_result(pending: deque):
+    """Wait for the oldest in-flight enrichment and return its result tuple."""
+    track_data, task = pending.popleft()
+    try:
+        enriched_data, skipped = await task
+        return track_data, enriched_data, skipped, None
+    except Exception as e:
+        return track_data, None, [], e
 
 async def search_itunes(title: str, artist: str) -> Optional[Dict[str, Any]]:
     """Search iTunes/Apple Music API for track metadata."""
     try:
-        async with httpx.AsyncClient() as client:
-            # Construct search query
-            search_term = f"{artist} {title}"
-            params = {
-                'term': search_term,
-                'media': 'music',
-                'entity': 'song',
-                'limit': 1
-            }
-            
-            response = await client.get(ITUNES_API_BASE, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('results'):
-                result = data['results'][0]
-                
-                return {
-                    'apple_music_url': result.get('trackViewUrl'),
-                    'artwork_url': result.get('artworkUrl100'),
-                    'release_year': result.get('releaseDate', '').split('-')[0] if result.get('releaseDate') else None,
-                    'genre': result.get('primaryGenreName', ''),
-                    'album': result.get('collectionName', ''),
-                    'duration': result.get('trackTimeMillis', 0) / 1000 if result.get('trackTimeMillis') else None
-                }
+        return await _timed_lookup("itunes", _lookup_itunes, title, artist)
+    except LookupSkipped as e:
+        logger.info("iTunes search skipped: %s", e)
     except Exception as e:
-        print(f"iTunes search error: {e}")
+        logger.warning("iTunes search error: %s", e)
     
     return None
 
@@ -68,33 +202,132 @@ async def search_youtube(title: str, artist: str) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        async with httpx.AsyncClient() as client:
-            # Construct search query
-            search_term = f"{artist} {title} official"
-            params = {
-                'part': 'snippet',
-                'q': search_term,
-                'type': 'video',
-                'maxResults': 1,
-                'key': YOUTUBE_API_KEY
-            }
-            
-            response = await client.get(YOUTUBE_API_BASE, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('items'):
-                item = data['items'][0]
-                video_id = item['id']['videoId']
-                
-                return {
-                    'youtube_url': f"https://www.youtube.com/watch?v={video_id}"
-                }
+        return await _timed_lookup("youtube", _lookup_youtube, title, artist)
+    except LookupSkipped as e:
+        logger.info("YouTube search skipped: %s", e)
     except Exception as e:
-        print(f"YouTube search error: {e}")
+        logger.warning("YouTube search error: %s", e)
     
     return None
 
+async def _timed_lookup(provider: str, lookup, title: str, artist: str) -> Optional[Dict[str, Any]]:
+    """Run a provider lookup, recording how long it took and how it ended."""
+    started = time.perf_counter()
+    outcome = "cancelled"
+    try:
+        data = await lookup(title, artist)
+        outcome = "found" if data else "not_found"
+        return data
+    except LookupSkipped:
+        outcome = "skipped"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        ENRICHMENT_DURATION.labels(provider, outcome).observe(time.perf_counter() - started)
+
+async def _lookup_itunes(title: str, artist: str) -> Optional[Dict[str, Any]]:
+    """Query the iTunes Search API; returns None when nothing matches and raises on errors."""
+    # Construct search query
+    search_term = f"{artist} {title}"
+    params = {
+        'term': search_term,
+        'media': 'music',
+        'entity': 'song',
+        'limit': 1
+    }
+    
+    data = await _get_json(ITUNES_API_BASE, params, itunes_rate_limiter)
+    if not data.get('results'):
+        return None
+    
+    result = data['results'][0]
+    return {
+        'apple_music_url': result.get('trackViewUrl'),
+        'artwork_url': result.get('artworkUrl100'),
+        'release_year': result.get('releaseDate', '').split('-')[0] if result.get('releaseDate') else None,
+        'genre': result.get('primaryGenreName', ''),
+        'album': result.get('collectionName', ''),
+        'duration': result.get('trackTimeMillis', 0) / 1000 if result.get('trackTimeMillis') else None
+    }
+
+async def _lookup_youtube(title: str, artist: str) -> Optional[Dict[str, Any]]:
+    """Query the YouTube Data API; returns None when nothing matches and raises on errors."""
+    # Every search costs quota whatever the outcome, so check the budget first
+    if not youtube_quota.try_spend(YOUTUBE_SEARCH_COST):
+        raise LookupSkipped("daily YouTube quota exhausted")
+    
+    # Construct search query
+    search_term = f"{artist} {title} official"
+    params = {
+        'part': 'snippet',
+        'q': search_term,
+        'type': 'video',
+        'maxResults': 1,
+        'key': YOUTUBE_API_KEY
+    }
+    
+    data = await _get_json(YOUTUBE_API_BASE, params, youtube_rate_limiter, youtube_quota)
+    if not data.get('items'):
+        return None
+    
+    video_id = data['items'][0]['id']['videoId']
+    return {
+        'youtube_url': f"https://www.youtube.com/watch?v={video_id}"
+    }
+
+async def _get_json(
+    url: str,
+    params: Dict[str, Any],
+    rate_limiter: TokenBucket,
+    quota: Optional[QuotaBudget] = None
+) -> Dict[str, Any]:
+    """
+    GET a provider endpoint within its rate limit, backing off and retrying on 429/503.
+    Raises LookupSkipped when the call would queue too long, the provider keeps
+    throttling, or it reports that `quota` is used up.
+    """
+    client = await open_http_client()
+    
+    for attempt in range(LOOKUP_MAX_RETRIES + 1):
+        try:
+            await rate_limiter.acquire(max_wait=LOOKUP_MAX_WAIT)
+        except RateLimitExceeded as e:
+            raise LookupSkipped(str(e))
+        
+        response = await client.get(url, params=params)
+        
+        if quota is not None and response.status_code == 403 and _is_quota_error(response):
+            quota.exhaust()
+            raise LookupSkipped("daily quota exhausted")
+        
+        if response.status_code in (429, 503):
+            delay = _retry_after(response)
+            if delay is None:
+                delay = LOOKUP_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 1)
+            # Hold back every other lookup to this provider too, not just this one
+            rate_limiter.pause(delay)
+            continue
+        
+        response.raise_for_status()
+        return response.json()
+    
+    raise LookupSkipped(f"still rate limited after {LOOKUP_MAX_RETRIES} retries")
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+def _is_quota_error(response: httpx.Response) -> bool:
+    try:
+        errors = response.json().get('error', {}).get('errors', [])
+    except ValueError:
+        return False
+    return any(error.get('reason') in ('quotaExceeded', 'dailyLimitExceeded') for error in errors)
+
 def format_duration(seconds: float) -> str:
     """Format duration in seconds to MM:SS format."""
     if not seconds:
@@ -0,0 +1,115 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Under gunicorn every worker keeps its own values; they are written to files in this
+# directory and /metrics adds them up (see gunicorn.conf.py)
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+# Statements per request; a route that needs many more than its neighbours is doing N+1 queries
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed while serving a request",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time a request spent executing SQL statements",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Time to execute one SQL statement, requests and background work alike",
+    buckets=QUERY_BUCKETS
+)
+ENRICHMENT_DURATION = Histogram(
+    "enrichment_lookup_duration_seconds", "Time of one metadata provider lookup, including rate limit waits",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS + (30.0, 60.0, 120.0)
+)
+
+class RequestStats:
+    """Database work done on behalf of the current request."""
+    
+    __slots__ = ("queries", "db_seconds")
+    
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Set by MetricsMiddleware for each request; None outside requests (startup, import jobs)
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def instrument_engine(engine: Engine):
+    """Time every statement on a (sync) engine; pass async_engine.sync_engine for the async one."""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        QUERY_DURATION.observe(elapsed)
+        # Async sessions run this in a greenlet of the request's task, so the context var is visible
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+class MetricsMiddleware:
+    """Record latency and database work per request, labelled with the matched route template."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            # The template, not the path, so playlist ids don't each get their own series
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+            REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_DURATION.labels(method, route).observe(stats.db_seconds)
+
+def metrics_response() -> Response:
+    """Every metric in the Prometheus text format, summed over the gunicorn workers when there are several."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
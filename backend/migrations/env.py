@@ -0,0 +1,65 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import text
+from database import engine, DATABASE_URL, Base
+import models  # noqa: F401  registers the tables on Base.metadata
+
+config = context.config
+
+# The app runs migrations itself at startup and keeps its own logging setup
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Key of the PostgreSQL advisory lock that lets one process at a time migrate
+MIGRATION_LOCK_KEY = 72_616_001
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # The search indexes are managed by hand (see migration 0004), not by models
+    if type_ == "table" and name.startswith("tracks_fts"):
+        return False
+    return name not in ("search_document", "ix_tracks_search_document")
+
+def _lock(connection):
+    """
+    Hold off other processes migrating the same database until this transaction ends.
+    Every worker of a deployment can start at once; the first migrates, the rest wait
+    and then find the schema at head.
+    """
+    if connection.dialect.name == "postgresql":
+        # Transaction-scoped, so it also holds through PgBouncer's transaction pooling
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    elif connection.dialect.name == "sqlite":
+        # pysqlite doesn't send BEGIN for DDL; take the database write lock up front instead
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # One transaction for the lock and every pending migration; PostgreSQL and SQLite both have transactional DDL
+    with engine.connect() as connection:
+        with connection.begin():
+            _lock(connection)
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_object=include_object,
+                render_as_batch=connection.dialect.name == "sqlite"
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,186 @@
+"""Baseline schema
+
+Creates the schema on an empty database. Databases created before migrations
+(by create_all at startup) are brought up to the same point instead: missing
+tables, columns and indexes are added and existing ones are left alone.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    ]
+
+# Table definitions in creation order (foreign keys point backwards)
+TABLES = {
+    "admins": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("email", sa.String, nullable=False),
+        sa.Column("hashed_password", sa.String, nullable=False),
+        sa.Column("is_active", sa.Boolean),
+        sa.Column("token_version", sa.Integer, nullable=False, server_default="0"),
+        *_timestamps(),
+    ],
+    "playlists": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("title", sa.String, nullable=False),
+        sa.Column("description", sa.Text),
+        sa.Column("class_date", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("is_published", sa.Boolean),
+        sa.Column("created_by", sa.Integer, sa.ForeignKey("admins.id"), nullable=False),
+        *_timestamps(),
+    ],
+    "recordings": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("fingerprint", sa.String, nullable=False),
+        sa.Column("title", sa.String, nullable=False),
+        sa.Column("artist", sa.String, nullable=False),
+        sa.Column("album", sa.String),
+        sa.Column("duration", sa.Float),
+        sa.Column("genre", sa.String),
+        sa.Column("release_year", sa.Integer),
+        sa.Column("apple_music_url", sa.String),
+        sa.Column("youtube_url", sa.String),
+        sa.Column("spotify_url", sa.String),
+        sa.Column("artwork_url", sa.String),
+        sa.Column("enriched_at", sa.DateTime(timezone=True)),
+        *_timestamps(),
+    ],
+    "tracks": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("playlist_id", sa.Integer, sa.ForeignKey("playlists.id"), nullable=False),
+        sa.Column("position", sa.Integer, nullable=False),
+        sa.Column("title", sa.String, nullable=False),
+        sa.Column("artist", sa.String, nullable=False),
+        sa.Column("album", sa.String),
+        sa.Column("duration", sa.Float),
+        sa.Column("bpm", sa.Integer),
+        sa.Column("genre", sa.String),
+        sa.Column("notes", sa.Text),
+        sa.Column("apple_music_url", sa.String),
+        sa.Column("youtube_url", sa.String),
+        sa.Column("spotify_url", sa.String),
+        sa.Column("artwork_url", sa.String),
+        sa.Column("release_year", sa.Integer),
+        sa.Column("recording_id", sa.Integer, sa.ForeignKey("recordings.id")),
+        *_timestamps(),
+    ],
+    "enrichment_cache": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("cache_key", sa.String, nullable=False),
+        sa.Column("data", sa.Text, nullable=False),
+        sa.Column("found", sa.Boolean),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        *_timestamps(),
+    ],
+    "import_jobs": lambda: [
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("created_by", sa.Integer, sa.ForeignKey("admins.id"), nullable=False),
+        sa.Column("filename", sa.String, nullable=False),
+        sa.Column("upload_path", sa.String),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("tracks_parsed", sa.Integer),
+        sa.Column("tracks_enriched", sa.Integer),
+        sa.Column("tracks_inserted", sa.Integer),
+        sa.Column("result", sa.Text),
+        *_timestamps(),
+    ],
+}
+
+# Columns added to tables after they first shipped, with the DDL startup used to add them
+LATER_COLUMNS = {
+    "admins": {"token_version": "INTEGER NOT NULL DEFAULT 0"},
+    "tracks": {"recording_id": "INTEGER REFERENCES recordings(id)"},
+}
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_admins_id", "admins", ["id"], False),
+    ("ix_admins_email", "admins", ["email"], True),
+    ("ix_playlists_id", "playlists", ["id"], False),
+    ("ix_playlists_created_by_class_date_id", "playlists", ["created_by", "class_date", "id"], False),
+    ("ix_playlists_created_by_published_class_date_id", "playlists", ["created_by", "is_published", "class_date", "id"], False),
+    ("ix_recordings_id", "recordings", ["id"], False),
+    ("ix_recordings_fingerprint", "recordings", ["fingerprint"], True),
+    ("ix_tracks_id", "tracks", ["id"], False),
+    ("ix_tracks_recording_id", "tracks", ["recording_id"], False),
+    ("ix_tracks_playlist_id_position", "tracks", ["playlist_id", "position"], False),
+    ("ix_enrichment_cache_id", "enrichment_cache", ["id"], False),
+    ("ix_enrichment_cache_cache_key", "enrichment_cache", ["cache_key"], True),
+    ("ix_import_jobs_id", "import_jobs", ["id"], False),
+]
+
+# Track search (see track_search.py). The PostgreSQL index expression must stay identical
+# to track_search._ts_document, or the planner won't use it.
+PG_SEARCH_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_tracks_search ON tracks USING GIN (("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(artist, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(album, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(genre, '')), 'C')))"
+)
+
+SQLITE_SEARCH_INDEX = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+        title, artist, album, genre, content='tracks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, genre) VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+    END""",
+    # Reorders only touch position, so they don't reindex
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_update AFTER UPDATE OF title, artist, album, genre ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, genre) VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre);
+    END""",
+]
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table, columns in TABLES.items():
+        if table not in existing_tables:
+            op.create_table(table, *columns())
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table)}
+        for name, ddl in LATER_COLUMNS.get(table, {}).items():
+            if name not in existing_columns:
+                op.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+    
+    existing_indexes = {
+        index["name"] for table in TABLES if table in existing_tables for index in inspector.get_indexes(table)
+    }
+    for name, table, columns, unique in INDEXES:
+        if name not in existing_indexes:
+            op.create_index(name, table, columns, unique=unique)
+    
+    if bind.dialect.name == "postgresql":
+        op.execute(PG_SEARCH_INDEX)
+    elif bind.dialect.name == "sqlite":
+        indexed = bind.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'tracks_fts'").first()
+        for statement in SQLITE_SEARCH_INDEX:
+            op.execute(statement)
+        if not indexed:
+            # Index the tracks that were there before the FTS table
+            op.execute("INSERT INTO tracks_fts(tracks_fts) VALUES ('rebuild')")
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS tracks_fts")
+    for table in reversed(list(TABLES)):
+        op.drop_table(table)
@@ -0,0 +1,22 @@
+"""Class date on import jobs
+
+The date chosen in the editor, for files that carry no date of their own.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("import_jobs", sa.Column("class_date", sa.DateTime(timezone=True)))
+
+def downgrade():
+    with op.batch_alter_table("import_jobs") as batch_op:
+        batch_op.drop_column("class_date")
@@ -0,0 +1,65 @@
+"""Recording fingerprints with truncated duration buckets
+
+Fingerprints used to round the duration, which split recordings a fraction of a second apart.
+Recompute them with whole-second truncation and merge the recordings that now share one,
+keeping an enriched recording where there is one.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# As in catalog.DURATION_BUCKET when this was written
+DURATION_BUCKET = 2
+
+recordings = sa.table(
+    "recordings",
+    sa.column("id", sa.Integer),
+    sa.column("fingerprint", sa.String),
+    sa.column("duration", sa.Float),
+    sa.column("enriched_at", sa.DateTime(timezone=True)),
+)
+tracks = sa.table("tracks", sa.column("recording_id", sa.Integer))
+
+def upgrade():
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(recordings.c.id, recordings.c.fingerprint, recordings.c.duration, recordings.c.enriched_at)
+    ).all()
+    
+    groups = defaultdict(list)
+    for row in rows:
+        # The normalized artist and title part is unchanged
+        key = row.fingerprint.rsplit("|", 1)[0]
+        seconds = str(int(row.duration) // DURATION_BUCKET * DURATION_BUCKET) if row.duration else ""
+        groups[f"{key}|{seconds}"].append(row)
+    
+    renamed = []
+    for fingerprint, group in groups.items():
+        group.sort(key=lambda row: (row.enriched_at is None, row.id))
+        kept, merged = group[0], [row.id for row in group[1:]]
+        if merged:
+            conn.execute(tracks.update().where(tracks.c.recording_id.in_(merged)).values(recording_id=kept.id))
+            conn.execute(recordings.delete().where(recordings.c.id.in_(merged)))
+        if kept.fingerprint != fingerprint:
+            renamed.append((kept.id, fingerprint))
+    
+    # Through a placeholder, so two fingerprints trading places never collide on the unique index
+    for recording_id, _ in renamed:
+        conn.execute(
+            recordings.update().where(recordings.c.id == recording_id).values(fingerprint=f"migrating:{recording_id}")
+        )
+    for recording_id, fingerprint in renamed:
+        conn.execute(recordings.update().where(recordings.c.id == recording_id).values(fingerprint=fingerprint))
+
+def downgrade():
+    # Merged recordings can't be split again; the new fingerprints still identify every recording
+    pass
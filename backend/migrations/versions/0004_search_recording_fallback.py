@@ -0,0 +1,146 @@
+"""Track search over catalog values
+
+Tracks show the album and genre of their recording when they leave them empty, so search has
+to match those too. A search index can't join, so the indexed values are copied in by triggers
+on tracks (and on recordings, whose changes reach every track using them): a trigger-maintained
+tsvector column on PostgreSQL, and an FTS5 table with its own content on SQLite.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+PG_UPGRADE = [
+    "DROP INDEX IF EXISTS ix_tracks_search",
+    "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS search_document tsvector",
+    # Weights as in track_search: title and artist first, then album, then genre
+    """CREATE OR REPLACE FUNCTION track_search_document(title text, artist text, album text, genre text)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(artist, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(album, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(genre, '')), 'C')
+    $$""",
+    """CREATE OR REPLACE FUNCTION tracks_search_document() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        recording recordings%ROWTYPE;
+    BEGIN
+        SELECT * INTO recording FROM recordings WHERE id = NEW.recording_id;
+        NEW.search_document := track_search_document(
+            NEW.title, NEW.artist,
+            coalesce(nullif(NEW.album, ''), recording.album), coalesce(nullif(NEW.genre, ''), recording.genre)
+        );
+        RETURN NEW;
+    END
+    $$""",
+    # Reorders only touch position, so they don't reindex
+    """CREATE TRIGGER tracks_search_document BEFORE INSERT OR UPDATE OF title, artist, album, genre, recording_id
+    ON tracks FOR EACH ROW EXECUTE FUNCTION tracks_search_document()""",
+    """CREATE OR REPLACE FUNCTION recordings_search_document() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE tracks SET search_document = track_search_document(
+            title, artist, coalesce(nullif(album, ''), NEW.album), coalesce(nullif(genre, ''), NEW.genre)
+        ) WHERE recording_id = NEW.id;
+        RETURN NULL;
+    END
+    $$""",
+    """CREATE TRIGGER recordings_search_document AFTER UPDATE OF album, genre ON recordings FOR EACH ROW
+    WHEN (OLD.album IS DISTINCT FROM NEW.album OR OLD.genre IS DISTINCT FROM NEW.genre)
+    EXECUTE FUNCTION recordings_search_document()""",
+    """UPDATE tracks SET search_document = track_search_document(
+        tracks.title, tracks.artist,
+        coalesce(nullif(tracks.album, ''), (SELECT album FROM recordings WHERE recordings.id = tracks.recording_id)),
+        coalesce(nullif(tracks.genre, ''), (SELECT genre FROM recordings WHERE recordings.id = tracks.recording_id))
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_tracks_search_document ON tracks USING GIN (search_document)",
+]
+
+PG_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS recordings_search_document ON recordings",
+    "DROP TRIGGER IF EXISTS tracks_search_document ON tracks",
+    "DROP FUNCTION IF EXISTS recordings_search_document()",
+    "DROP FUNCTION IF EXISTS tracks_search_document()",
+    "ALTER TABLE tracks DROP COLUMN IF EXISTS search_document",
+    "DROP FUNCTION IF EXISTS track_search_document(text, text, text, text)",
+    # As in the baseline migration
+    "CREATE INDEX IF NOT EXISTS ix_tracks_search ON tracks USING GIN (("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(artist, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(album, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(genre, '')), 'C')))",
+]
+
+# The values a track displays; new.* in the track triggers, a joined track in the others
+SQLITE_TRACK_VALUES = """{t}.id, {t}.title, {t}.artist,
+    coalesce(nullif({t}.album, ''), (SELECT album FROM recordings WHERE recordings.id = {t}.recording_id)),
+    coalesce(nullif({t}.genre, ''), (SELECT genre FROM recordings WHERE recordings.id = {t}.recording_id))"""
+
+SQLITE_UPGRADE = [
+    "DROP TRIGGER IF EXISTS tracks_fts_insert",
+    "DROP TRIGGER IF EXISTS tracks_fts_delete",
+    "DROP TRIGGER IF EXISTS tracks_fts_update",
+    "DROP TABLE IF EXISTS tracks_fts",
+    # Its own content rather than content='tracks': what it indexes isn't a row of tracks
+    """CREATE VIRTUAL TABLE tracks_fts USING fts5(
+        title, artist, album, genre, tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER tracks_fts_insert AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) SELECT {SQLITE_TRACK_VALUES.format(t="new")};
+    END""",
+    """CREATE TRIGGER tracks_fts_delete AFTER DELETE ON tracks BEGIN
+        DELETE FROM tracks_fts WHERE rowid = old.id;
+    END""",
+    # Reorders only touch position, so they don't reindex
+    f"""CREATE TRIGGER tracks_fts_update AFTER UPDATE OF title, artist, album, genre, recording_id ON tracks BEGIN
+        DELETE FROM tracks_fts WHERE rowid = old.id;
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) SELECT {SQLITE_TRACK_VALUES.format(t="new")};
+    END""",
+    f"""CREATE TRIGGER recordings_fts_update AFTER UPDATE OF album, genre ON recordings BEGIN
+        DELETE FROM tracks_fts WHERE rowid IN (SELECT id FROM tracks WHERE recording_id = new.id);
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre)
+            SELECT {SQLITE_TRACK_VALUES.format(t="tracks")} FROM tracks WHERE tracks.recording_id = new.id;
+    END""",
+    f"""INSERT INTO tracks_fts(rowid, title, artist, album, genre)
+        SELECT {SQLITE_TRACK_VALUES.format(t="tracks")} FROM tracks""",
+]
+
+# As in the baseline migration
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS recordings_fts_update",
+    "DROP TRIGGER IF EXISTS tracks_fts_insert",
+    "DROP TRIGGER IF EXISTS tracks_fts_delete",
+    "DROP TRIGGER IF EXISTS tracks_fts_update",
+    "DROP TABLE IF EXISTS tracks_fts",
+    """CREATE VIRTUAL TABLE tracks_fts USING fts5(
+        title, artist, album, genre, content='tracks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER tracks_fts_insert AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre);
+    END""",
+    """CREATE TRIGGER tracks_fts_delete AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, genre) VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+    END""",
+    """CREATE TRIGGER tracks_fts_update AFTER UPDATE OF title, artist, album, genre ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album, genre) VALUES ('delete', old.id, old.title, old.artist, old.album, old.genre);
+        INSERT INTO tracks_fts(rowid, title, artist, album, genre) VALUES (new.id, new.title, new.artist, new.album, new.genre);
+    END""",
+    "INSERT INTO tracks_fts(tracks_fts) VALUES ('rebuild')",
+]
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = PG_UPGRADE if dialect == "postgresql" else SQLITE_UPGRADE if dialect == "sqlite" else []
+    for statement in statements:
+        op.execute(statement)
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    statements = PG_DOWNGRADE if dialect == "postgresql" else SQLITE_DOWNGRADE if dialect == "sqlite" else []
+    for statement in statements:
+        op.execute(statement)
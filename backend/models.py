@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -10,6 +10,8 @@ class Admin(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped on password change; tokens carrying an older version are rejected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -27,14 +29,21 @@ class Playlist(Base):
     
     # Relationships
     creator = relationship("Admin", back_populates="playlists")
-    tracks = relationship("Track", back_populates="playlist", cascade="all, delete-orphan")
+    tracks = relationship("Track", back_populates="playlist", cascade="all, delete-orphan", order_by="[Track.position, Track.id]")
+    
+    __table_args__ = (
+        # Calendar ranges and keyset-paginated listings, both ordered by (class_date, id)
+        Index("ix_playlists_created_by_class_date_id", "created_by", "class_date", "id"),
+        # Listings filtered by published state
+        Index("ix_playlists_created_by_published_class_date_id", "created_by", "is_published", "class_date", "id"),
+    )
 
 class Track(Base):
     __tablename__ = "tracks"
     
     id = Column(Integer, primary_key=True, index=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
-    position = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)  # Sparse sort key, see track_order.py
     title = Column(String, nullable=False)
     artist = Column(String, nullable=False)
     album = Column(String)
@@ -52,11 +61,77 @@ class Track(Base):
     artwork_url = Column(String)
     release_year = Column(Integer)
     
+    # Shared catalog entry; its links and metadata fill in whatever the track leaves empty
+    recording_id = Column(Integer, ForeignKey("recordings.id"), index=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     playlist = relationship("Playlist", back_populates="tracks")
+    # Joined on every track load: responses always need it and it is one row per track
+    recording = relationship("Recording", lazy="joined")
+    
+    __table_args__ = (
+        # Per-playlist joins, counts and ordered track loads
+        Index("ix_tracks_playlist_id_position", "playlist_id", "position"),
+    )
+
+class Recording(Base):
+    """A unique song in the shared catalog, enriched once however many playlists use it."""
+    __tablename__ = "recordings"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String, unique=True, index=True, nullable=False)  # Normalized "artist|title|seconds"
+    title = Column(String, nullable=False)
+    artist = Column(String, nullable=False)
+    album = Column(String)
+    duration = Column(Float)  # Duration in seconds
+    genre = Column(String)
+    release_year = Column(Integer)
+    
+    # External links
+    apple_music_url = Column(String)
+    youtube_url = Column(String)
+    spotify_url = Column(String)
+    artwork_url = Column(String)
+    
+    enriched_at = Column(DateTime(timezone=True))  # Unset until provider lookups complete
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class EnrichmentCacheEntry(Base):
+    __tablename__ = "enrichment_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True, nullable=False)  # Normalized "artist|title"
+    data = Column(Text, nullable=False)  # JSON-encoded lookup results, "{}" for misses
+    found = Column(Boolean, default=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    created_by = Column(Integer, ForeignKey("admins.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    upload_path = Column(String)  # Stored upload, removed once the job finishes
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    class_date = Column(DateTime(timezone=True))  # For the playlist when the file has no date of its own
+    
+    # Progress counters
+    tracks_parsed = Column(Integer, default=0)
+    tracks_enriched = Column(Integer, default=0)
+    tracks_inserted = Column(Integer, default=0)
+    
+    result = Column(Text)  # JSON-encoded XMLImportResult once finished
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 # Add back reference to Admin
 Admin.playlists = relationship("Playlist", back_populates="creator")
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+from models import Playlist
+from compression import negotiate_encoding, precompress
+
+load_dotenv()
+
+# Seconds a serialized public playlist is served without checking the database.
+# Edits invalidate the local cache at once; this bounds staleness on other workers.
+PUBLIC_CACHE_TTL = float(os.getenv("PUBLIC_PLAYLIST_CACHE_TTL", "30"))
+PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv("PUBLIC_PLAYLIST_CACHE_MAX_ENTRIES", "256"))
+
+class CachedPlaylist:
+    """Pre-serialized public playlist body, its precompressed encodings and its HTTP validators."""
+    
+    __slots__ = ("body", "encoded", "etag", "modified", "last_modified", "expires_at")
+    
+    def __init__(self, body: bytes, encoded: Dict[str, bytes], updated_at: Optional[datetime]):
+        self.body = body
+        self.encoded = encoded
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # HTTP dates have whole seconds
+        self.modified = _utc(updated_at).replace(microsecond=0) if updated_at else None
+        self.last_modified = format_datetime(self.modified, usegmt=True) if self.modified else None
+        self.expires_at = time.monotonic() + PUBLIC_CACHE_TTL
+    
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[str]:
+        """Stored encoding to send for the client's Accept-Encoding; None for the plain body."""
+        return negotiate_encoding(accept_encoding, self.encoded)
+    
+    def content(self, encoding: Optional[str]) -> bytes:
+        return self.encoded[encoding] if encoding else self.body
+    
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Each encoding is its own representation and gets its own strong ETag
+        return self.etag[:-1] + f'-{encoding}"' if encoding else self.etag
+    
+    def headers(self, encoding: Optional[str] = None):
+        headers = {
+            "ETag": self.etag_for(encoding),
+            "Cache-Control": "public, no-cache",
+            "Vary": "Accept-Encoding"
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return headers
+    
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True if the client's If-None-Match header already names this body."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            # Proxies that compress responses weaken ETags; compare the opaque part
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == self.etag or tag in (self.etag_for(encoding) for encoding in self.encoded):
+                return True
+        return False
+    
+    def unmodified_since(self, if_modified_since: Optional[str]) -> bool:
+        """True if the client's If-Modified-Since date is at or after the last change."""
+        if not if_modified_since or self.modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _utc(since) >= self.modified
+
+_cache: "OrderedDict[int, CachedPlaylist]" = OrderedDict()
+# Loads in flight, so a burst of misses for one playlist shares a single query
+_fills: Dict[int, "asyncio.Task[Optional[CachedPlaylist]]"] = {}
+
+# Loads a published playlist: its serialized body and last change, or None if there is none
+PlaylistLoader = Callable[[int], Awaitable[Optional[Tuple[bytes, Optional[datetime]]]]]
+
+def get_cached_public_playlist(playlist_id: int) -> Optional[CachedPlaylist]:
+    entry = _cache.get(playlist_id)
+    if entry is None:
+        return None
+    if entry.expires_at <= time.monotonic():
+        del _cache[playlist_id]
+        return None
+    _cache.move_to_end(playlist_id)
+    return entry
+
+async def get_public_playlist_entry(playlist_id: int, load: PlaylistLoader) -> Optional[CachedPlaylist]:
+    """
+    Cached entry for a public playlist, calling `load` on a miss; None if it isn't published.
+    Concurrent misses wait on the same load instead of each querying.
+    """
+    entry = get_cached_public_playlist(playlist_id)
+    if entry is not None:
+        return entry
+    fill = _fills.get(playlist_id)
+    if fill is None:
+        fill = _fills[playlist_id] = asyncio.create_task(_fill(playlist_id, load))
+    # One attendee giving up mustn't cancel the load the others are waiting on
+    return await asyncio.shield(fill)
+
+async def _fill(playlist_id: int, load: PlaylistLoader) -> Optional[CachedPlaylist]:
+    try:
+        loaded = await load(playlist_id)
+        if loaded is None:
+            return None
+        body, updated_at = loaded
+        # Compressed once per cached body at the slowest settings, off the event loop. Done before
+        # anyone is served so every response is a stored representation with a strong ETag; the
+        # middleware would weaken it.
+        entry = CachedPlaylist(body, await asyncio.to_thread(precompress, body), updated_at)
+        # An edit during the load invalidated it; serve it to those waiting but don't keep it
+        if _fills.get(playlist_id) is asyncio.current_task():
+            _store(playlist_id, entry)
+        return entry
+    finally:
+        if _fills.get(playlist_id) is asyncio.current_task():
+            del _fills[playlist_id]
+
+def _store(playlist_id: int, entry: CachedPlaylist):
+    _cache[playlist_id] = entry
+    _cache.move_to_end(playlist_id)
+    while len(_cache) > PUBLIC_CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+def invalidate_public_playlist(playlist_id: int):
+    """Drop a playlist's cached public body; call after committing a change to it or its tracks."""
+    _cache.pop(playlist_id, None)
+    _fills.pop(playlist_id, None)
+
+async def touch_playlist(db: AsyncSession, playlist_id: int):
+    """Bump updated_at so Last-Modified moves when only the playlist's tracks change."""
+    await db.execute(
+        update(Playlist).where(Playlist.id == playlist_id).values(updated_at=func.now()),
+        execution_options={"synchronize_session": False}
+    )
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
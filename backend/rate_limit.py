@@ -0,0 +1,91 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database available; fall back to UTC days
+    _QUOTA_TIMEZONE = timezone.utc
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than allowed for its turn."""
+    
+    def __init__(self, wait: float):
+        super().__init__(f"rate limited, next slot in {wait:.0f}s")
+        self.wait = wait
+
+class TokenBucket:
+    """
+    Async token bucket allowing `rate_per_minute` calls on average with bursts of `burst`.
+    Callers reserve a slot up front, so a call that would queue longer than
+    `max_wait` is rejected immediately instead of waiting and then failing.
+    """
+    
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self, max_wait: Optional[float] = None):
+        """Wait for a slot; raise RateLimitExceeded if it is more than max_wait seconds away."""
+        self._refill(time.monotonic())
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        if max_wait is not None and wait > max_wait:
+            raise RateLimitExceeded(wait)
+        
+        # Tokens may go negative: that is the queue of callers already waiting
+        self.tokens -= 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. after the provider answered 429."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+class QuotaBudget:
+    """
+    Daily unit budget for a metered API such as the YouTube Data API, which
+    resets at midnight Pacific time. Tracked per process.
+    """
+    
+    def __init__(self, daily_units: int):
+        self.daily_units = daily_units
+        self.used = 0
+        self.day = self._today()
+    
+    @staticmethod
+    def _today():
+        return datetime.now(_QUOTA_TIMEZONE).date()
+    
+    def _roll_over(self):
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+    
+    @property
+    def remaining(self) -> int:
+        self._roll_over()
+        return max(self.daily_units - self.used, 0)
+    
+    def try_spend(self, units: int) -> bool:
+        """Reserve `units` from today's budget; False if that would exceed it."""
+        self._roll_over()
+        if self.used + units > self.daily_units:
+            return False
+        self.used += units
+        return True
+    
+    def exhaust(self):
+        """Mark today's budget as used up, e.g. when the provider reports quotaExceeded."""
+        self._roll_over()
+        self.used = self.daily_units
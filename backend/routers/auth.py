@@ -1,24 +1,28 @@
-from datetime import timedelta
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models import Admin
-from schemas import AdminCreate, AdminLogin, Token, AdminResponse
+from schemas import AdminCreate, AdminLogin, Token, AdminResponse, PasswordChange
 from auth import (
     authenticate_admin, 
-    create_access_token, 
-    get_password_hash, 
+    create_admin_token, 
+    hash_password, 
+    verify_and_update_password,
     get_admin_by_email,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    get_current_admin
+    get_current_admin,
+    AdminPrincipal,
+    invalidate_admin_principal
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/register", response_model=AdminResponse)
-async def register_admin(admin_data: AdminCreate, db: Session = Depends(get_db)):
+async def register_admin(admin_data: AdminCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if admin already exists
-    existing_admin = get_admin_by_email(db, admin_data.email)
+    existing_admin = await get_admin_by_email(db, admin_data.email)
     if existing_admin:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -26,45 +30,54 @@ async def register_admin(admin_data: AdminCreate, db: Session = Depends(get_db))
         )
     
     # Create new admin
-    hashed_password = get_password_hash(admin_data.password)
+    hashed_password = await hash_password(admin_data.password)
     db_admin = Admin(
         email=admin_data.email,
         hashed_password=hashed_password
     )
     db.add(db_admin)
-    db.commit()
-    db.refresh(db_admin)
+    await db.commit()
+    await db.refresh(db_admin)
     
     return db_admin
 
 @router.post("/login", response_model=Token)
-async def login_admin(admin_data: AdminLogin, db: Session = Depends(get_db)):
-    print(f"Login attempt for email: {admin_data.email}")
-    
-    # Check if admin exists
-    admin = get_admin_by_email(db, admin_data.email)
-    print(f"Admin found: {admin is not None}")
-    
-    if admin:
-        print(f"Admin email: {admin.email}")
-        print(f"Admin hashed password exists: {bool(admin.hashed_password)}")
-    
-    admin = authenticate_admin(db, admin_data.email, admin_data.password)
+async def login_admin(admin_data: AdminLogin, db: AsyncSession = Depends(get_async_db)):
+    admin = await authenticate_admin(db, admin_data.email, admin_data.password)
     if not admin:
-        print(f"Authentication failed for {admin_data.email}")
+        logger.info("Failed login for %s", admin_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": admin.email}, expires_delta=access_token_expires
-    )
+    access_token = create_admin_token(admin)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/change-password", response_model=Token)
+async def change_password(
+    password_data: PasswordChange,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    admin = await db.get(Admin, current_admin.id)
+    password_valid, _ = await verify_and_update_password(password_data.current_password, admin.hashed_password)
+    if not password_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Current password is incorrect"
+        )
+    
+    # Bumping the version signs out every other session holding an old token
+    admin.hashed_password = await hash_password(password_data.new_password)
+    admin.token_version = (admin.token_version or 0) + 1
+    await db.commit()
+    invalidate_admin_principal(admin.id)
+    
+    return {"access_token": create_admin_token(admin), "token_type": "bearer"}
+
 @router.get("/me", response_model=AdminResponse)
-async def get_current_admin_info(current_admin: Admin = Depends(get_current_admin)):
+async def get_current_admin_info(current_admin: AdminPrincipal = Depends(get_current_admin)):
     return current_admin
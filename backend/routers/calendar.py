@@ -1,11 +1,13 @@
 from typing import List
 from datetime import datetime, date
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Playlist, Admin
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Playlist, Track, Recording
 from schemas import CalendarEvent
-from auth import get_current_admin
+from auth import AdminPrincipal, get_current_admin
+from catalog import track_column
 
 router = APIRouter()
 
@@ -13,29 +15,41 @@ router = APIRouter()
 async def get_calendar_events(
     start_date: date = None,
     end_date: date = None,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
-    query = db.query(Playlist).filter(
+    # One grouped query: playlist fields plus track count and total duration (with catalog fallback)
+    query = select(
+        Playlist.id,
+        Playlist.title,
+        Playlist.class_date,
+        Playlist.is_published,
+        func.count(Track.id).label("tracks_count"),
+        func.sum(track_column("duration")).label("total_duration")
+    ).outerjoin(Track, Track.playlist_id == Playlist.id).outerjoin(
+        Recording, Track.recording_id == Recording.id
+    ).where(
         Playlist.created_by == current_admin.id
     )
     
     if start_date:
-        query = query.filter(Playlist.class_date >= start_date)
+        query = query.where(Playlist.class_date >= start_date)
     if end_date:
-        query = query.filter(Playlist.class_date <= end_date)
+        query = query.where(Playlist.class_date <= end_date)
     
-    playlists = query.all()
+    result = await db.execute(query.group_by(Playlist.id).order_by(Playlist.class_date))
+    rows = result.all()
     
     events = []
-    for playlist in playlists:
+    for row in rows:
         events.append(CalendarEvent(
-            id=playlist.id,
-            title=playlist.title,
-            start=playlist.class_date,
-            end=playlist.class_date,  # Single day events
-            is_published=playlist.is_published,
-            tracks_count=len(playlist.tracks)
+            id=row.id,
+            title=row.title,
+            start=row.class_date,
+            end=row.class_date,  # Single day events
+            is_published=row.is_published,
+            tracks_count=row.tracks_count,
+            total_duration=row.total_duration
         ))
     
     return events
@@ -44,8 +58,8 @@ async def get_calendar_events(
 async def get_month_events(
     year: int,
     month: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Get first and last day of the month
     start_date = date(year, month, 1)
@@ -66,8 +80,8 @@ async def get_day_events(
     year: int,
     month: int,
     day: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     target_date = date(year, month, day)
     return await get_calendar_events(
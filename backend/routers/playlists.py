@@ -1,72 +1,188 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Playlist, Track, Admin
-from schemas import PlaylistCreate, PlaylistUpdate, PlaylistResponse, PlaylistWithTracks, XMLImportResult
-from auth import get_current_admin
-from xml_parser import parse_playlist_xml
-from metadata_enrichment import enrich_track_metadata
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy import func, select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal
+from models import Playlist, Track, Recording, ImportJob
+from schemas import PlaylistCreate, PlaylistUpdate, PlaylistResponse, PlaylistWithTracks, PlaylistSummary, XMLImportJobResponse
+from auth import AdminPrincipal, get_current_admin
+from catalog import track_column
+from import_jobs import enqueue_import, job_to_response
+from fast_json import PLAYLIST_COLUMNS, FastJSONResponse, dumps, with_tracks
+from public_cache import get_public_playlist_entry, invalidate_public_playlist
 
 router = APIRouter()
 
 @router.get("/", response_model=List[PlaylistResponse])
 async def get_playlists(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    published: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
-    playlists = db.query(Playlist).filter(
-        Playlist.created_by == current_admin.id
-    ).offset(skip).limit(limit).all()
-    return playlists
+    conditions = _listing_conditions(current_admin.id, published, date_from, date_to, q)
+    result = await db.execute(_page(select(*PLAYLIST_COLUMNS), conditions, cursor, skip, limit))
+    rows = result.all()
+    
+    # Every playlist's tracks come in one extra query
+    response = FastJSONResponse(dumps(await with_tracks(db, rows[:limit])))
+    await _set_page_headers(response, db, rows, conditions, limit, include_total)
+    return response
+
+@router.get("/summary", response_model=List[PlaylistSummary])
+async def get_playlist_summaries(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    published: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    conditions = _listing_conditions(current_admin.id, published, date_from, date_to, q)
+    # Track counts and durations are aggregated in SQL; no track rows are loaded. Durations
+    # fall back to the catalog recording, as in the track responses.
+    query = select(
+        Playlist,
+        func.count(Track.id).label("tracks_count"),
+        func.sum(track_column("duration")).label("total_duration")
+    ).outerjoin(Track, Track.playlist_id == Playlist.id).outerjoin(
+        Recording, Track.recording_id == Recording.id
+    ).group_by(Playlist.id)
+    result = await db.execute(_page(query, conditions, cursor, skip, limit))
+    rows = result.all()
+    
+    await _set_page_headers(response, db, [playlist for playlist, _, _ in rows], conditions, limit, include_total)
+    return [
+        PlaylistSummary(
+            id=playlist.id,
+            title=playlist.title,
+            description=playlist.description,
+            class_date=playlist.class_date,
+            is_published=playlist.is_published,
+            created_by=playlist.created_by,
+            created_at=playlist.created_at,
+            updated_at=playlist.updated_at,
+            tracks_count=tracks_count,
+            total_duration=total_duration
+        )
+        for playlist, tracks_count, total_duration in rows[:limit]
+    ]
+
+def _listing_conditions(admin_id: int, published, date_from, date_to, q) -> list:
+    conditions = [Playlist.created_by == admin_id]
+    if published is not None:
+        conditions.append(Playlist.is_published == published)
+    if date_from is not None:
+        conditions.append(Playlist.class_date >= date_from)
+    if date_to is not None:
+        conditions.append(Playlist.class_date < date_to)
+    if q:
+        # Escaped, so % and _ in the search match literally
+        conditions.append(Playlist.title.icontains(q, autoescape=True))
+    return conditions
+
+def _page(query, conditions: list, cursor: Optional[str], skip: int, limit: int):
+    """Apply filters and keyset pagination on (class_date, id); fetches one extra row to detect a next page."""
+    query = query.where(*conditions).order_by(Playlist.class_date, Playlist.id)
+    if cursor:
+        class_date, playlist_id = _decode_cursor(cursor)
+        # Seeks straight to the position on the (created_by, ..., class_date, id) indexes, however deep
+        query = query.where(tuple_(Playlist.class_date, Playlist.id) > (class_date, playlist_id))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+async def _set_page_headers(response: Response, db: AsyncSession, playlists, conditions: list, limit: int, include_total: bool):
+    if len(playlists) > limit:
+        last = playlists[limit - 1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.class_date, last.id)
+    if include_total:
+        # Only counted on request: it scans every matching row, unlike the page itself
+        total = await db.scalar(select(func.count()).select_from(Playlist).where(*conditions))
+        response.headers["X-Total-Count"] = str(total)
+
+def _encode_cursor(class_date: datetime, playlist_id: int) -> str:
+    raw = json.dumps([class_date.isoformat(), playlist_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        class_date, playlist_id = json.loads(raw)
+        return datetime.fromisoformat(class_date), int(playlist_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
 @router.get("/{playlist_id}", response_model=PlaylistWithTracks)
 async def get_playlist(
     playlist_id: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(*PLAYLIST_COLUMNS).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    row = result.first()
     
-    if not playlist:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Playlist not found"
         )
     
-    return playlist
+    playlist, = await with_tracks(db, [row])
+    return FastJSONResponse(dumps(playlist))
 
 @router.post("/", response_model=PlaylistResponse)
 async def create_playlist(
     playlist_data: PlaylistCreate,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     db_playlist = Playlist(
         **playlist_data.dict(),
         created_by=current_admin.id
     )
     db.add(db_playlist)
-    db.commit()
-    db.refresh(db_playlist)
+    await db.commit()
+    # Load server defaults and the (empty) track list without lazy loading later
+    await db.refresh(db_playlist, attribute_names=["created_at", "updated_at", "tracks"])
     return db_playlist
 
 @router.put("/{playlist_id}", response_model=PlaylistResponse)
 async def update_playlist(
     playlist_id: int,
     playlist_data: PlaylistUpdate,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
     
     if not playlist:
         raise HTTPException(
@@ -78,20 +194,24 @@ async def update_playlist(
     for field, value in update_data.items():
         setattr(playlist, field, value)
     
-    db.commit()
-    db.refresh(playlist)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    await db.refresh(playlist, attribute_names=["updated_at", "tracks"])
     return playlist
 
 @router.delete("/{playlist_id}")
 async def delete_playlist(
     playlist_id: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
     
     if not playlist:
         raise HTTPException(
@@ -99,16 +219,19 @@ async def delete_playlist(
             detail="Playlist not found"
         )
     
-    db.delete(playlist)
-    db.commit()
+    # Bulk delete instead of loading every track for the ORM cascade
+    await db.execute(delete(Track).where(Track.playlist_id == playlist_id))
+    await db.execute(delete(Playlist).where(Playlist.id == playlist_id))
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
     return {"message": "Playlist deleted successfully"}
 
-@router.post("/import-xml", response_model=XMLImportResult)
+@router.post("/import-xml", response_model=XMLImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def import_xml_playlist(
     file: UploadFile = File(...),
-    class_date: str = None,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    class_date: Optional[datetime] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     if not (file.filename.endswith('.xml') or file.filename.endswith('.plist')):
         raise HTTPException(
@@ -116,68 +239,65 @@ async def import_xml_playlist(
             detail="File must be an XML or plist file"
         )
     
-    try:
-        content = await file.read()
-        parsed_data = parse_playlist_xml(content)
-        
-        # Create playlist
-        playlist = Playlist(
-            title=parsed_data.get('title', f'Imported Playlist - {file.filename}'),
-            description=parsed_data.get('description', ''),
-            class_date=parsed_data.get('class_date'),
-            created_by=current_admin.id
-        )
-        db.add(playlist)
-        db.commit()
-        db.refresh(playlist)
-        
-        # Add tracks
-        tracks_imported = 0
-        errors = []
-        
-        for track_data in parsed_data.get('tracks', []):
-            try:
-                # Enrich metadata
-                enriched_data = await enrich_track_metadata(track_data)
-                
-                track = Track(
-                    playlist_id=playlist.id,
-                    **enriched_data
-                )
-                db.add(track)
-                tracks_imported += 1
-            except Exception as e:
-                errors.append(f"Error importing track {track_data.get('title', 'Unknown')}: {str(e)}")
-        
-        db.commit()
-        
-        return XMLImportResult(
-            success=True,
-            message=f"Successfully imported {tracks_imported} tracks",
-            playlist_id=playlist.id,
-            tracks_imported=tracks_imported,
-            errors=errors
+    # Parsing, enrichment and inserts run on the import workers; poll the job for progress
+    job = await enqueue_import(db, file, current_admin.id, class_date)
+    return job_to_response(job)
+
+@router.get("/import-xml/{job_id}", response_model=XMLImportJobResponse)
+async def get_import_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    result = await db.execute(
+        select(ImportJob).where(
+            ImportJob.id == job_id,
+            ImportJob.created_by == current_admin.id
         )
-        
-    except Exception as e:
-        return XMLImportResult(
-            success=False,
-            message=f"Import failed: {str(e)}",
-            errors=[str(e)]
+    )
+    job = result.scalars().first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
         )
+    
+    return job_to_response(job)
 
 # Public endpoint for published playlists
 @router.get("/public/{playlist_id}", response_model=PlaylistWithTracks)
-async def get_public_playlist(playlist_id: int, db: Session = Depends(get_db)):
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.is_published == True
-    ).first()
-    
-    if not playlist:
+async def get_public_playlist(playlist_id: int, request: Request):
+    # Attendees hit this all at once at class start; serve pre-serialized bytes when we can
+    cached = await get_public_playlist_entry(playlist_id, _load_public_playlist)
+    if cached is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Playlist not found or not published"
         )
     
-    return playlist
+    # Served precompressed; the compression middleware leaves those alone
+    encoding = cached.negotiate(request.headers.get("accept-encoding"))
+    # If-Modified-Since only counts when the client sent no ETag to compare
+    if_none_match = request.headers.get("if-none-match")
+    if cached.matches(if_none_match) or (
+        not if_none_match and cached.unmodified_since(request.headers.get("if-modified-since"))
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cached.headers(encoding))
+    
+    return Response(content=cached.content(encoding), media_type="application/json", headers=cached.headers(encoding))
+
+async def _load_public_playlist(playlist_id: int):
+    # Its own session: the load is shared by every request waiting on it, not owned by one
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(*PLAYLIST_COLUMNS).where(
+                Playlist.id == playlist_id,
+                Playlist.is_published == True
+            )
+        )
+        row = result.first()
+        if not row:
+            return None
+        playlist, = await with_tracks(db, [row])
+        return dumps(playlist), row.updated_at or row.created_at
@@ -1,24 +1,57 @@
+import os
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Track, Playlist, Admin
-from schemas import TrackCreate, TrackUpdate, TrackResponse
-from auth import get_current_admin
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update, delete, case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Track, Playlist
+from schemas import TrackCreate, TrackUpdate, TrackResponse, TrackOrder, TrackPatch, TrackBatchDelete, TrackSearchResult
+from auth import AdminPrincipal, get_current_admin
+from bulk_insert import bulk_insert_tracks
+from track_search import search_tracks
+from catalog import resolve_recordings, relink_tracks, track_fingerprint
+from fast_json import FastJSONResponse, dumps, load_tracks
+from public_cache import touch_playlist, invalidate_public_playlist
+from track_order import (
+    POSITION_GAP,
+    allocate_position,
+    schedule_rebalance,
+    track_ordinal
+)
 
 router = APIRouter()
 
+# Fields that decide which catalog recording a track is
+IDENTITY_FIELDS = {"title", "artist", "duration"}
+
+# Most tracks one batch request may create, update or delete; larger sets go in several requests
+TRACK_BATCH_MAX_SIZE = int(os.getenv("TRACK_BATCH_MAX_SIZE", "1000"))
+
+@router.get("/search", response_model=List[TrackSearchResult])
+async def search_library(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    # Every track across the admin's playlists, ranked by the full-text index
+    rows = await search_tracks(db, current_admin.id, q, limit)
+    return [TrackSearchResult.model_validate(dict(row._mapping)) for row in rows]
+
 @router.get("/playlist/{playlist_id}", response_model=List[TrackResponse])
 async def get_playlist_tracks(
     playlist_id: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Verify playlist ownership
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
     
     if not playlist:
         raise HTTPException(
@@ -26,24 +59,24 @@ async def get_playlist_tracks(
             detail="Playlist not found"
         )
     
-    tracks = db.query(Track).filter(
-        Track.playlist_id == playlist_id
-    ).order_by(Track.position).all()
-    
-    return tracks
+    tracks = await load_tracks(db, Track.playlist_id == playlist_id)
+    return FastJSONResponse(dumps(tracks.get(playlist_id, [])))
 
 @router.post("/playlist/{playlist_id}", response_model=TrackResponse)
 async def create_track(
     playlist_id: int,
     track_data: TrackCreate,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Verify playlist ownership
-    playlist = db.query(Playlist).filter(
-        Playlist.id == playlist_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
     
     if not playlist:
         raise HTTPException(
@@ -51,27 +84,160 @@ async def create_track(
             detail="Playlist not found"
         )
     
+    # Slot the track in between its neighbours without renumbering them
+    key, ordinal, crowded = await allocate_position(db, playlist_id, track_data.position)
+    recordings = await resolve_recordings(db, [track_data.dict()])
     track = Track(
         playlist_id=playlist_id,
-        **track_data.dict()
+        **track_data.dict(exclude={"position"}),
+        position=key,
+        recording_id=recordings[track_fingerprint(track_data.dict())].id
     )
     db.add(track)
-    db.commit()
-    db.refresh(track)
-    return track
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    if crowded:
+        schedule_rebalance(playlist_id)
+    await db.refresh(track, attribute_names=["created_at", "updated_at", "recording"])
+    
+    response = TrackResponse.model_validate(track)
+    response.position = ordinal
+    return response
+
+@router.post("/playlist/{playlist_id}/batch")
+async def create_tracks_batch(
+    playlist_id: int,
+    tracks_data: List[TrackCreate],
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    _check_batch_size(len(tracks_data))
+    
+    # Verify playlist ownership
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
+    
+    # Append after the current last track, in the order of the requested positions
+    last_key = await db.scalar(select(func.max(Track.position)).where(Track.playlist_id == playlist_id))
+    ordered = [track_data.dict() for track_data in sorted(tracks_data, key=lambda track_data: track_data.position)]
+    recordings = await resolve_recordings(db, ordered)
+    tracks_created = await bulk_insert_tracks(db, playlist_id, (
+        {
+            **track_data,
+            "position": (last_key or 0) + index * POSITION_GAP,
+            "recording_id": recordings[track_fingerprint(track_data)].id
+        }
+        for index, track_data in enumerate(ordered, 1)
+    ))
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    return {"message": f"Created {tracks_created} tracks", "tracks_created": tracks_created}
+
+@router.patch("/playlist/{playlist_id}/batch")
+async def update_tracks_batch(
+    playlist_id: int,
+    patches: List[TrackPatch],
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    _check_batch_size(len(patches))
+    
+    # Verify playlist ownership
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
+    
+    await _require_playlist_tracks(db, playlist_id, [patch.id for patch in patches])
+    
+    # Only the fields each patch sets are written; reorder through the /order endpoint
+    rows = [patch.dict(exclude_unset=True) for patch in patches]
+    rows = [row for row in rows if len(row) > 1]
+    if rows:
+        # ORM bulk UPDATE by primary key: one executemany per distinct set of fields
+        await db.execute(update(Track), rows)
+        # Tracks renamed or retimed now belong to a different catalog recording
+        await relink_tracks(db, [row["id"] for row in rows if IDENTITY_FIELDS & row.keys()])
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    return {"message": f"Updated {len(rows)} tracks", "tracks_updated": len(rows)}
+
+@router.post("/playlist/{playlist_id}/batch-delete")
+async def delete_tracks_batch(
+    playlist_id: int,
+    batch: TrackBatchDelete,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    _check_batch_size(len(batch.track_ids))
+    
+    # Verify playlist ownership
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
+    
+    await _require_playlist_tracks(db, playlist_id, batch.track_ids)
+    
+    result = await db.execute(
+        delete(Track).where(
+            Track.playlist_id == playlist_id,
+            Track.id.in_(batch.track_ids)
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    return {"message": f"Deleted {result.rowcount} tracks", "tracks_deleted": result.rowcount}
 
 @router.put("/{track_id}", response_model=TrackResponse)
 async def update_track(
     track_id: int,
     track_data: TrackUpdate,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Get track and verify playlist ownership
-    track = db.query(Track).join(Playlist).filter(
-        Track.id == track_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Track).join(Playlist).where(
+            Track.id == track_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    track = result.scalars().first()
     
     if not track:
         raise HTTPException(
@@ -80,24 +246,44 @@ async def update_track(
         )
     
     update_data = track_data.dict(exclude_unset=True)
+    new_position = update_data.pop("position", None)
     for field, value in update_data.items():
         setattr(track, field, value)
     
-    db.commit()
-    db.refresh(track)
-    return track
+    if IDENTITY_FIELDS & update_data.keys():
+        track_values = {"title": track.title, "artist": track.artist, "duration": track.duration}
+        recordings = await resolve_recordings(db, [track_values])
+        track.recording_id = recordings[track_fingerprint(track_values)].id
+    
+    crowded = False
+    if new_position is not None:
+        ordinal, crowded = await _move_track(db, track, new_position)
+    
+    await touch_playlist(db, track.playlist_id)
+    await db.commit()
+    invalidate_public_playlist(track.playlist_id)
+    if crowded:
+        schedule_rebalance(track.playlist_id)
+    await db.refresh(track, attribute_names=["position", "updated_at", "recording"])
+    
+    response = TrackResponse.model_validate(track)
+    response.position = ordinal if new_position is not None else await track_ordinal(db, track)
+    return response
 
 @router.delete("/{track_id}")
 async def delete_track(
     track_id: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Get track and verify playlist ownership
-    track = db.query(Track).join(Playlist).filter(
-        Track.id == track_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Track).join(Playlist).where(
+            Track.id == track_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    track = result.scalars().first()
     
     if not track:
         raise HTTPException(
@@ -105,22 +291,28 @@ async def delete_track(
             detail="Track not found"
         )
     
-    db.delete(track)
-    db.commit()
+    playlist_id = track.playlist_id
+    await db.delete(track)
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
     return {"message": "Track deleted successfully"}
 
 @router.post("/{track_id}/reorder")
 async def reorder_tracks(
     track_id: int,
     new_position: int,
-    db: Session = Depends(get_db),
-    current_admin: Admin = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     # Get track and verify playlist ownership
-    track = db.query(Track).join(Playlist).filter(
-        Track.id == track_id,
-        Playlist.created_by == current_admin.id
-    ).first()
+    result = await db.execute(
+        select(Track).join(Playlist).where(
+            Track.id == track_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    track = result.scalars().first()
     
     if not track:
         raise HTTPException(
@@ -128,24 +320,89 @@ async def reorder_tracks(
             detail="Track not found"
         )
     
-    # Update positions of other tracks
-    if new_position < track.position:
-        # Moving up - shift tracks down
-        db.query(Track).filter(
-            Track.playlist_id == track.playlist_id,
-            Track.position >= new_position,
-            Track.position < track.position
-        ).update({Track.position: Track.position + 1})
-    else:
-        # Moving down - shift tracks up
-        db.query(Track).filter(
-            Track.playlist_id == track.playlist_id,
-            Track.position > track.position,
-            Track.position <= new_position
-        ).update({Track.position: Track.position - 1})
-    
-    # Update the track's position
-    track.position = new_position
-    db.commit()
+    # Only the moved track is written; its new key sits between its new neighbours
+    _, crowded = await _move_track(db, track, new_position)
+    await touch_playlist(db, track.playlist_id)
+    await db.commit()
+    invalidate_public_playlist(track.playlist_id)
+    if crowded:
+        schedule_rebalance(track.playlist_id)
     
     return {"message": "Track reordered successfully"}
+
+@router.put("/playlist/{playlist_id}/order")
+async def set_track_order(
+    playlist_id: int,
+    order: TrackOrder,
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    # Verify playlist ownership
+    result = await db.execute(
+        select(Playlist).where(
+            Playlist.id == playlist_id,
+            Playlist.created_by == current_admin.id
+        )
+    )
+    playlist = result.scalars().first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found"
+        )
+    
+    result = await db.execute(select(Track.id).where(Track.playlist_id == playlist_id))
+    if len(order.track_ids) != len(set(order.track_ids)) or set(order.track_ids) != set(result.scalars().all()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="track_ids must list every track in the playlist exactly once"
+        )
+    
+    # Renumber the whole playlist in one statement
+    if order.track_ids:
+        await db.execute(
+            update(Track).where(
+                Track.playlist_id == playlist_id
+            ).values(position=case(
+                {track_id: ordinal * POSITION_GAP for ordinal, track_id in enumerate(order.track_ids, 1)},
+                value=Track.id
+            )),
+            execution_options={"synchronize_session": False}
+        )
+    await touch_playlist(db, playlist_id)
+    await db.commit()
+    invalidate_public_playlist(playlist_id)
+    
+    return {"message": "Track order updated successfully"}
+
+def _check_batch_size(count: int):
+    if count > TRACK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {TRACK_BATCH_MAX_SIZE} tracks per batch; send the rest in further requests"
+        )
+
+async def _require_playlist_tracks(db: AsyncSession, playlist_id: int, track_ids: List[int]):
+    # One query checks that every id belongs to the (already ownership-checked) playlist
+    result = await db.execute(
+        select(Track.id).where(
+            Track.playlist_id == playlist_id,
+            Track.id.in_(track_ids)
+        )
+    )
+    missing = set(track_ids) - set(result.scalars().all())
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tracks not found in this playlist: {sorted(missing)}"
+        )
+
+async def _move_track(db: AsyncSession, track: Track, new_position: int):
+    key, ordinal, crowded = await allocate_position(db, track.playlist_id, new_position, exclude_track_id=track.id)
+    # Written with a Core UPDATE: an inline rebalance may have changed the stored key behind the ORM's back
+    await db.execute(
+        update(Track).where(Track.id == track.id).values(position=key),
+        execution_options={"synchronize_session": False}
+    )
+    return ordinal, crowded
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator, model_validator
 from datetime import datetime
 from typing import List, Optional
 
@@ -20,6 +20,10 @@ class AdminResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -45,14 +49,64 @@ class TrackCreate(TrackBase):
 class TrackUpdate(TrackBase):
     position: Optional[int] = None
 
+class TrackPatch(BaseModel):
+    id: int
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    duration: Optional[float] = None
+    bpm: Optional[int] = None
+    genre: Optional[str] = None
+    notes: Optional[str] = None
+    apple_music_url: Optional[str] = None
+    youtube_url: Optional[str] = None
+    spotify_url: Optional[str] = None
+    artwork_url: Optional[str] = None
+    release_year: Optional[int] = None
+    
+    @field_validator("title", "artist")
+    @classmethod
+    def required_fields_not_null(cls, value):
+        # May be left out of a patch, but not cleared
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
+class TrackOrder(BaseModel):
+    track_ids: List[int]
+
+class TrackBatchDelete(BaseModel):
+    track_ids: List[int]
+
+# Track fields that fall back to the catalog recording when the track leaves them empty
+RECORDING_FALLBACK_FIELDS = (
+    'album', 'duration', 'genre', 'release_year',
+    'apple_music_url', 'youtube_url', 'spotify_url', 'artwork_url'
+)
+
 class TrackResponse(TrackBase):
     id: int
     position: int
+    recording_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+    
+    @model_validator(mode="before")
+    @classmethod
+    def fill_from_recording(cls, data):
+        # Only use a recording that is already loaded; a lazy load can't run under asyncio
+        state = getattr(data, "_sa_instance_state", None)
+        if state is None or "recording" in state.unloaded or data.recording is None:
+            return data
+        
+        values = {name: getattr(data, name) for name in cls.model_fields if hasattr(data, name)}
+        for name in RECORDING_FALLBACK_FIELDS:
+            if values.get(name) in (None, ''):
+                values[name] = getattr(data.recording, name)
+        return values
 
 # Playlist schemas
 class PlaylistBase(BaseModel):
@@ -79,10 +133,32 @@ class PlaylistResponse(PlaylistBase):
     
     class Config:
         from_attributes = True
+    
+    @model_validator(mode="after")
+    def number_tracks(self):
+        # Stored positions are sparse sort keys; report each track's place in the list
+        for ordinal, track in enumerate(self.tracks, 1):
+            track.position = ordinal
+        return self
 
 class PlaylistWithTracks(PlaylistResponse):
     tracks: List[TrackResponse] = []
 
+class PlaylistSummary(PlaylistBase):
+    id: int
+    is_published: bool
+    created_by: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    tracks_count: int = 0
+    total_duration: Optional[float] = None  # Seconds
+
+class TrackSearchResult(TrackBase):
+    id: int
+    playlist_id: int
+    playlist_title: str
+    class_date: datetime
+
 # Calendar schemas
 class CalendarEvent(BaseModel):
     id: int
@@ -91,6 +167,7 @@ class CalendarEvent(BaseModel):
     end: Optional[datetime] = None
     is_published: bool
     tracks_count: int
+    total_duration: Optional[float] = None  # Seconds
     
     class Config:
         from_attributes = True
@@ -102,3 +179,14 @@ class XMLImportResult(BaseModel):
     playlist_id: Optional[int] = None
     tracks_imported: int = 0
     errors: List[str] = []
+
+class XMLImportJobResponse(BaseModel):
+    job_id: int
+    status: str
+    filename: str
+    tracks_parsed: int = 0
+    tracks_enriched: int = 0
+    tracks_inserted: int = 0
+    result: Optional[XMLImportResult] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The app reads its settings at import; point it at a throwaway database and upload dir first
+_data_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_data_dir, 'test.db')}"
+os.environ["IMPORT_UPLOAD_DIR"] = os.path.join(_data_dir, "uploads")
+os.environ["ADMIN_EMAIL"] = "admin@example.com"
+os.environ["ADMIN_PASSWORD"] = "admin"
+os.environ["YOUTUBE_API_KEY"] = ""
+os.environ["METRICS_TOKEN"] = "test-metrics-token"
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+# Backend modules are imported flat, as the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client():
+    import metadata_enrichment
+    from fastapi.testclient import TestClient
+    
+    async def no_match(title, artist):
+        return None
+    
+    # No provider calls from tests
+    metadata_enrichment._lookup_itunes = no_match
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/auth/login", json={"email": "admin@example.com", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def playlist_id(client, auth_headers):
+    """A new published playlist."""
+    response = client.post(
+        "/api/playlists/", json={"title": "Test class", "class_date": "2026-01-05T07:00:00Z"}, headers=auth_headers
+    )
+    playlist_id = response.json()["id"]
+    client.put(f"/api/playlists/{playlist_id}", json={"is_published": True}, headers=auth_headers)
+    return playlist_id
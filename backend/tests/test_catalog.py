@@ -0,0 +1,10 @@
+import pytest
+from catalog import recording_fingerprint
+
+@pytest.mark.parametrize("first, second", [(200.9, 201.1), (200.0, 201.99), (199.5, 198.0)])
+def test_close_durations_share_a_recording(first, second):
+    assert recording_fingerprint("Artist", "Title", first) == recording_fingerprint("Artist", "Title", second)
+
+def test_bucket_edges_are_fixed():
+    assert recording_fingerprint("Artist", "Title", 201.9) != recording_fingerprint("Artist", "Title", 202.0)
+    assert recording_fingerprint("Artist", "Title", 203.5) != recording_fingerprint("Artist", "Title", 204.5)
@@ -0,0 +1,44 @@
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from compression import CompressionMiddleware
+
+def _app(headers):
+    async def endpoint(request):
+        return Response(b"x" * 4096, media_type="application/json", headers=headers)
+    
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+def test_vary_is_not_repeated():
+    response = _app({"Vary": "Accept-Encoding"}).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_vary_keeps_other_tokens():
+    response = _app({"Vary": "Origin"}).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+
+def test_public_playlist_vary(client, playlist_id):
+    for accept_encoding in ("gzip", "br", "identity"):
+        response = client.get(f"/api/playlists/public/{playlist_id}", headers={"Accept-Encoding": accept_encoding})
+        assert response.status_code == 200
+        assert response.headers["vary"] == "Accept-Encoding"
+
+def test_precompress_directory_skips_small_files(tmp_path, monkeypatch):
+    import compression
+    
+    (tmp_path / "app.js").write_bytes(b"console.log('spin');\n" * 200)
+    (tmp_path / "tiny.js").write_bytes(b"1;")
+    reads = []
+    real_precompress = compression.precompress
+    monkeypatch.setattr(compression, "precompress", lambda data: reads.append(data) or real_precompress(data))
+    
+    assert compression.precompress_directory(str(tmp_path)) == len(compression.ENCODINGS)
+    assert not (tmp_path / "tiny.js.gz").exists()
+    # A second run finds everything up to date and compresses nothing
+    reads.clear()
+    assert compression.precompress_directory(str(tmp_path)) == 0
+    assert reads == []
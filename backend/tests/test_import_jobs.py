@@ -0,0 +1,54 @@
+import asyncio
+import time
+import httpx
+import import_jobs
+import main
+from xml_parser import parse_playlist_xml
+
+GENERIC_XML = b"""<playlist><title>Responsive</title><date>2026-02-01</date>
+<track><title>One</title><artist>A</artist></track>
+<track><title>Two</title><artist>B</artist></track>
+</playlist>"""
+
+def _wait_for_job(client, auth_headers, job_id):
+    for _ in range(200):
+        job = client.get(f"/api/playlists/import-xml/{job_id}", headers=auth_headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("import did not finish")
+
+def test_requests_are_served_while_an_import_parses(client, auth_headers, monkeypatch):
+    def slow_parse(upload):
+        # Stands in for a large upload: blocks whatever thread it runs on
+        time.sleep(1.0)
+        return parse_playlist_xml(upload)
+    
+    monkeypatch.setattr(import_jobs, "parse_playlist_xml", slow_parse)
+    
+    async def import_and_ping():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            response = await http.post(
+                "/api/playlists/import-xml",
+                files={"file": ("class.xml", GENERIC_XML, "text/xml")},
+                headers=auth_headers
+            )
+            job_id = response.json()["job_id"]
+            # Let the import worker pick the job up and start parsing; a blocked loop stretches this wait too
+            started = time.perf_counter()
+            await asyncio.sleep(0.2)
+            health = await http.get("/api/health")
+            elapsed = time.perf_counter() - started
+            job = (await http.get(f"/api/playlists/import-xml/{job_id}", headers=auth_headers)).json()
+            return job_id, health.status_code, elapsed, job["status"]
+    
+    job_id, health_status, elapsed, status_during = client.portal.call(import_and_ping)
+    assert health_status == 200
+    assert status_during == "running"
+    assert elapsed < 0.7
+    
+    job = _wait_for_job(client, auth_headers, job_id)
+    assert job["status"] == "completed"
+    assert job["tracks_parsed"] == 2
+    assert job["tracks_inserted"] == 2
@@ -0,0 +1,18 @@
+import pytest
+
+METRICS_HEADERS = {"Authorization": "Bearer test-metrics-token"}
+
+@pytest.mark.parametrize("path", ["/metrics", "/api/health/pool"])
+def test_monitoring_needs_the_token(client, auth_headers, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    # An admin login is not a metrics token
+    assert client.get(path, headers=auth_headers).status_code == 401
+    assert client.get(path, headers=METRICS_HEADERS).status_code == 200
+
+def test_monitoring_is_off_without_a_token(client, monkeypatch):
+    import main
+    
+    monkeypatch.setattr(main, "METRICS_TOKEN", None)
+    assert client.get("/metrics", headers=METRICS_HEADERS).status_code == 404
+    assert client.get("/api/health/pool", headers=METRICS_HEADERS).status_code == 404
@@ -0,0 +1,30 @@
+from sqlalchemy import update
+from database import SessionLocal
+from models import Track
+
+def test_totals_include_durations_only_on_the_recording(client, auth_headers, playlist_id):
+    client.post(
+        f"/api/tracks/playlist/{playlist_id}",
+        json={"title": "Own duration", "artist": "A", "duration": 100, "position": 1},
+        headers=auth_headers
+    )
+    track = client.post(
+        f"/api/tracks/playlist/{playlist_id}",
+        json={"title": "Catalog duration", "artist": "B", "duration": 200, "position": 2},
+        headers=auth_headers
+    ).json()
+    # Leave the duration only on the linked recording
+    with SessionLocal() as db:
+        db.execute(update(Track).where(Track.id == track["id"]).values(duration=None))
+        db.commit()
+    
+    tracks = client.get(f"/api/tracks/playlist/{playlist_id}", headers=auth_headers).json()
+    assert [t["duration"] for t in tracks] == [100, 200]
+    
+    summaries = client.get("/api/playlists/summary", params={"limit": 500}, headers=auth_headers).json()
+    summary = next(s for s in summaries if s["id"] == playlist_id)
+    assert summary["total_duration"] == 300
+    
+    events = client.get("/api/calendar/events", headers=auth_headers).json()
+    event = next(e for e in events if e["id"] == playlist_id)
+    assert event["total_duration"] == 300
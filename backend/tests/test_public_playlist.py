@@ -0,0 +1,38 @@
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import timedelta
+
+def _add_tracks(client, auth_headers, playlist_id, count=30):
+    tracks = [
+        {"title": f"Climb {n}", "artist": "Spin Band", "album": "Intervals", "duration": 240, "position": n}
+        for n in range(1, count + 1)
+    ]
+    response = client.post(f"/api/tracks/playlist/{playlist_id}/batch", json=tracks, headers=auth_headers)
+    assert response.status_code == 200
+
+def test_first_response_has_a_strong_etag(client, auth_headers, playlist_id):
+    _add_tracks(client, auth_headers, playlist_id)
+    # The first request fills the cache; it must already be served from the stored encodings
+    response = client.get(f"/api/playlists/public/{playlist_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert not response.headers["etag"].startswith("W/")
+    assert len(response.json()["tracks"]) == 30
+    
+    again = client.get(
+        f"/api/playlists/public/{playlist_id}",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}
+    )
+    assert again.status_code == 304
+
+def test_if_modified_since(client, auth_headers, playlist_id):
+    url = f"/api/playlists/public/{playlist_id}"
+    last_modified = client.get(url).headers["last-modified"]
+    
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    later = format_datetime(parsedate_to_datetime(last_modified) + timedelta(hours=1), usegmt=True)
+    assert client.get(url, headers={"If-Modified-Since": later}).status_code == 304
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(hours=1), usegmt=True)
+    assert client.get(url, headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get(url, headers={"If-Modified-Since": "not a date"}).status_code == 200
+    # An ETag that doesn't match wins over the date
+    assert client.get(url, headers={"If-Modified-Since": last_modified, "If-None-Match": '"stale"'}).status_code == 200
@@ -0,0 +1,44 @@
+from sqlalchemy import update
+from database import SessionLocal
+from models import Recording, Track
+
+def _search(client, auth_headers, q):
+    response = client.get("/api/tracks/search", params={"q": q}, headers=auth_headers)
+    assert response.status_code == 200
+    return [track["id"] for track in response.json()]
+
+def test_search_matches_values_only_on_the_recording(client, auth_headers, playlist_id):
+    track = client.post(
+        f"/api/tracks/playlist/{playlist_id}",
+        json={"title": "Hill Repeats", "artist": "Cadence", "album": "Sunrise Sessions", "genre": "Synthwave", "position": 1},
+        headers=auth_headers
+    ).json()
+    # Leave album and genre only on the linked recording
+    with SessionLocal() as db:
+        db.execute(update(Track).where(Track.id == track["id"]).values(album=None, genre=""))
+        db.commit()
+    
+    assert track["id"] in _search(client, auth_headers, "sunrise")
+    assert track["id"] in _search(client, auth_headers, "cadence synthwave")
+    
+    # A change to the recording reaches the tracks using it
+    with SessionLocal() as db:
+        db.execute(update(Recording).where(Recording.id == track["recording_id"]).values(album="Moonlight Climb"))
+        db.commit()
+    assert track["id"] not in _search(client, auth_headers, "sunrise")
+    assert track["id"] in _search(client, auth_headers, "moonlight")
+
+def test_search_follows_track_edits_and_deletes(client, auth_headers, playlist_id):
+    track = client.post(
+        f"/api/tracks/playlist/{playlist_id}",
+        json={"title": "Tempo Push", "artist": "Gearshift", "position": 1},
+        headers=auth_headers
+    ).json()
+    assert track["id"] in _search(client, auth_headers, "gearshift")
+    
+    client.put(f"/api/tracks/{track['id']}", json={"title": "Tempo Push", "artist": "Freewheel"}, headers=auth_headers)
+    assert track["id"] not in _search(client, auth_headers, "gearshift")
+    assert track["id"] in _search(client, auth_headers, "freewheel")
+    
+    client.delete(f"/api/tracks/{track['id']}", headers=auth_headers)
+    assert track["id"] not in _search(client, auth_headers, "freewheel")
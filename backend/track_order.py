@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+from typing import Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Track
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Stored positions are sort keys spaced this far apart, so a move or insert only
+# writes the moved row (the new key is the midpoint of its neighbours). The API
+# reports 1-based ordinals; clients never see the keys.
+POSITION_GAP = int(os.getenv("TRACK_POSITION_GAP", "1024"))
+
+# Playlists waiting for a background rebalance, and the tasks doing it
+_pending: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+def position_key(ordinal: int) -> int:
+    """Sort key for the nth track of a freshly numbered playlist."""
+    return ordinal * POSITION_GAP
+
+def track_ordering():
+    return (Track.position, Track.id)
+
+async def allocate_position(
+    db: AsyncSession,
+    playlist_id: int,
+    ordinal: int,
+    exclude_track_id: Optional[int] = None
+) -> Tuple[int, int, bool]:
+    """
+    Sort key that places a track at the given 1-based ordinal among the playlist's other tracks.
+    Returns (key, ordinal actually used, crowded); crowded means the gap is used up and the
+    playlist should be rebalanced after commit. Rebalances inline when there is no room at all.
+    """
+    key, ordinal, crowded = await _key_between_neighbours(db, playlist_id, ordinal, exclude_track_id)
+    if key is None:
+        await rebalance_playlist(db, playlist_id)
+        key, ordinal, crowded = await _key_between_neighbours(db, playlist_id, ordinal, exclude_track_id)
+    return key, ordinal, crowded
+
+async def _key_between_neighbours(db: AsyncSession, playlist_id: int, ordinal: int, exclude_track_id: Optional[int]):
+    conditions = [Track.playlist_id == playlist_id]
+    if exclude_track_id is not None:
+        conditions.append(Track.id != exclude_track_id)
+    
+    ordinal = max(ordinal, 1)
+    # The keys just before and at the target slot; both come off the (playlist_id, position) index
+    result = await db.execute(
+        select(Track.position).where(*conditions).order_by(*track_ordering()).offset(max(ordinal - 2, 0)).limit(2)
+    )
+    keys = result.scalars().all()
+    
+    if ordinal == 1:
+        before, after = None, keys[0] if keys else None
+    else:
+        before = keys[0] if keys else None
+        after = keys[1] if len(keys) > 1 else None
+        if before is None:
+            # Past the end of a shorter playlist: append
+            count = await db.scalar(select(func.count()).select_from(Track).where(*conditions))
+            ordinal = count + 1
+            before = await db.scalar(select(func.max(Track.position)).where(*conditions))
+    
+    if after is None:
+        return (before or 0) + POSITION_GAP, ordinal, False
+    if before is None:
+        return after - POSITION_GAP, ordinal, False
+    
+    key = (before + after) // 2
+    if key == before:
+        return None, ordinal, True
+    return key, ordinal, key - before == 1 or after - key == 1
+
+async def rebalance_playlist(db: AsyncSession, playlist_id: int):
+    """Respace a playlist's keys evenly in one UPDATE, keeping the current order."""
+    numbered = select(
+        Track.id,
+        func.row_number().over(order_by=track_ordering()).label("ordinal")
+    ).where(Track.playlist_id == playlist_id).subquery()
+    await db.execute(
+        update(Track).where(Track.id == numbered.c.id).values(position=numbered.c.ordinal * POSITION_GAP),
+        execution_options={"synchronize_session": False}
+    )
+
+def schedule_rebalance(playlist_id: int):
+    """Respace a playlist in the background; call after committing the move that crowded it."""
+    if playlist_id in _pending:
+        return
+    _pending.add(playlist_id)
+    task = asyncio.create_task(_rebalance_in_background(playlist_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def _rebalance_in_background(playlist_id: int):
+    try:
+        async with AsyncSessionLocal() as db:
+            await rebalance_playlist(db, playlist_id)
+            await db.commit()
+    except Exception:
+        logger.exception("Rebalancing playlist %s failed", playlist_id)
+    finally:
+        _pending.discard(playlist_id)
+
+async def track_ordinal(db: AsyncSession, track: Track) -> int:
+    """1-based place of a track in its playlist."""
+    before = await db.scalar(
+        select(func.count()).select_from(Track).where(
+            Track.playlist_id == track.playlist_id,
+            (Track.position < track.position) | ((Track.position == track.position) & (Track.id < track.id))
+        )
+    )
+    return before + 1
@@ -0,0 +1,62 @@
+import re
+from typing import List
+from sqlalchemy import select, func, literal_column, text, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Track, Playlist, Recording
+from catalog import track_column
+
+# 'simple' keeps song titles and artist names as written: no stemming or stop words
+TS_CONFIG = "simple"
+
+# Search indexes, both kept up to date by triggers from migration 0004. They hold the values the
+# track displays, its recording's album and genre included when the track leaves them empty.
+# PostgreSQL: a weighted tsvector column on tracks (title and artist A, album B, genre C) with a
+# GIN index. SQLite: the FTS5 table tracks_fts, keyed by track id.
+TS_DOCUMENT = literal_column("tracks.search_document")
+
+RESULT_COLUMNS = [
+    'id', 'playlist_id', 'title', 'artist', 'album', 'duration', 'bpm', 'genre', 'notes',
+    'apple_music_url', 'youtube_url', 'spotify_url', 'artwork_url', 'release_year'
+]
+
+def _terms(query: str) -> List[str]:
+    # Keep word characters only, so user input can't inject query syntax
+    return re.findall(r"\w+", query.casefold())
+
+async def search_tracks(db: AsyncSession, admin_id: int, query: str, limit: int = 20) -> list:
+    """
+    Tracks in the admin's playlists matching every term of the query, best first.
+    Terms match as prefixes so results come in while the instructor types.
+    Rows carry the track's fields plus playlist_title and class_date.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    
+    columns = (
+        *(track_column(name) for name in RESULT_COLUMNS),
+        Playlist.title.label("playlist_title"),
+        Playlist.class_date
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        tsquery = func.to_tsquery(literal_column(f"'{TS_CONFIG}'"), " & ".join(f"{term}:*" for term in terms))
+        document = TS_DOCUMENT
+        statement = select(*columns).join(Playlist, Track.playlist_id == Playlist.id).outerjoin(
+            Recording, Track.recording_id == Recording.id
+        ).where(
+            Playlist.created_by == admin_id,
+            document.op("@@")(tsquery)
+        ).order_by(func.ts_rank(document, tsquery).desc(), Track.id.desc())
+    else:
+        match = " ".join(f'"{term}"*' for term in terms)
+        fts = text("SELECT rowid AS id, bm25(tracks_fts, 10.0, 8.0, 4.0, 2.0) AS rank FROM tracks_fts WHERE tracks_fts MATCH :match") \
+            .bindparams(match=match).columns(id=Track.id.type, rank=Float).subquery("fts")
+        # bm25 is lower for better matches
+        statement = select(*columns).join(fts, fts.c.id == Track.id).join(Playlist, Track.playlist_id == Playlist.id).outerjoin(
+            Recording, Track.recording_id == Recording.id
+        ).where(
+            Playlist.created_by == admin_id
+        ).order_by(fts.c.rank, Track.id.desc())
+    
+    result = await db.execute(statement.limit(limit))
+    return result.all()
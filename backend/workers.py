@@ -0,0 +1,15 @@
+import os
+from uvicorn.workers import UvicornWorker
+
+class AppWorker(UvicornWorker):
+    """
+    Gunicorn worker running the app on uvicorn with the fast event loop and HTTP
+    parser chosen explicitly, instead of whatever "auto" finds installed.
+    """
+    
+    CONFIG_KWARGS = {
+        "loop": os.getenv("UVICORN_LOOP", "uvloop"),
+        "http": os.getenv("UVICORN_HTTP", "httptools"),
+        # Startup and shutdown work in main.lifespan must run in every worker
+        "lifespan": "on",
+    }
@@ -1,21 +1,42 @@
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union, BinaryIO, Tuple, Callable
 import re
-from itunes_parser import parse_itunes_library_xml, detect_itunes_library
+from itunes_parser import stream_itunes_library_xml, detect_itunes_library, SNIFF_BYTES
 
-def parse_playlist_xml(xml_content: bytes) -> Dict[str, Any]:
+def parse_playlist_xml(source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
     """
     Parse XML playlist file and extract playlist and track information.
     Supports common XML formats used by DJ software and playlist managers.
-    Also supports iTunes Library XML files.
+    Also supports iTunes Library XML files, whose 'tracks' are returned as a
+    generator so large libraries are never held in memory as a full tree.
+    
+    The format is sniffed from the first few KB of the upload, so every
+    upload is parsed exactly once by the parser registered for its format.
     """
-    # Check if this is an iTunes library file
-    if detect_itunes_library(xml_content):
-        return parse_itunes_library_xml(xml_content)
+    if isinstance(source, (bytes, bytearray)):
+        head = source[:SNIFF_BYTES]
+    else:
+        head = source.read(SNIFF_BYTES)
+        source.seek(0)
     
+    _, parser = detect_playlist_format(head)
+    return parser(source)
+
+def detect_playlist_format(xml_head: bytes) -> Tuple[str, Callable[[Any], Dict[str, Any]]]:
+    """Return the name and parser of the first registered format matching the upload."""
+    for name, detector, parser in PLAYLIST_FORMATS:
+        if detector(xml_head):
+            return name, parser
+    raise ValueError("Unsupported playlist format")
+
+def parse_generic_playlist_xml(source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+    """Parse playlist XML in the loose track/playlist element layout used by DJ software."""
     try:
-        root = ET.fromstring(xml_content)
+        if isinstance(source, (bytes, bytearray)):
+            root = ET.fromstring(source)
+        else:
+            root = ET.parse(source).getroot()
     except ET.ParseError as e:
         raise ValueError(f"Invalid XML format: {str(e)}")
     
@@ -144,3 +165,10 @@ def parse_date(date_str: str) -> datetime:
             continue
     
     return None
+
+# Supported upload formats, tried in order. Each entry is
+# (name, detector over the first SNIFF_BYTES of the upload, parser).
+PLAYLIST_FORMATS = [
+    ('itunes_library', detect_itunes_library, stream_itunes_library_xml),
+    ('generic_xml', lambda xml_head: True, parse_generic_playlist_xml),
+]
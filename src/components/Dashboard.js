@@ -18,13 +18,13 @@ function Dashboard() {
 
   const fetchPlaylists = async () => {
     try {
-      const response = await axios.get('/api/playlists/');
+      const response = await axios.get('/api/playlists/summary');
       setPlaylists(response.data);
       
       // Calculate stats
       const totalPlaylists = response.data.length;
       const publishedPlaylists = response.data.filter(p => p.is_published).length;
-      const totalTracks = response.data.reduce((sum, p) => sum + p.tracks.length, 0);
+      const totalTracks = response.data.reduce((sum, p) => sum + p.tracks_count, 0);
       
       setStats({
         totalPlaylists,
@@ -182,7 +182,7 @@ function Dashboard() {
                         {formatDate(playlist.class_date)}
                       </td>
                       <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
-                        {playlist.tracks.length}
+                        {playlist.tracks_count}
                       </td>
                       <td className="px-6 py-4 whitespace-nowrap">
                         <span className={`inline-flex px-2 py-1 text-xs font-semibold rounded-full ${
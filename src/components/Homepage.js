@@ -18,7 +18,7 @@ function Homepage() {
 
   const fetchPublishedPlaylists = async () => {
     try {
-      const response = await axios.get('/api/playlists/');
+      const response = await axios.get('/api/playlists/summary');
       // Filter only published playlists
       const publishedPlaylists = response.data.filter(playlist => playlist.is_published);
       setPlaylists(publishedPlaylists);
@@ -145,7 +145,7 @@ function Homepage() {
                 )}
                 <div className="flex items-center text-gray-400 text-sm">
                   <Clock className="h-4 w-4 mr-1" />
-                  <span>{playlist.tracks?.length || 0} tracks</span>
+                  <span>{playlist.tracks_count || 0} tracks</span>
                 </div>
               </div>
             </div>
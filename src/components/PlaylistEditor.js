@@ -4,6 +4,9 @@ import axios from 'axios';
 import { Save, Upload, Plus, Trash2, ExternalLink, Music } from 'lucide-react';
 import { useDropzone } from 'react-dropzone';
 
+// Stop waiting on an XML import after this long; large libraries with many new tracks can take a while
+const IMPORT_POLL_TIMEOUT_MS = 30 * 60 * 1000;
+
 function PlaylistEditor() {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -130,10 +133,21 @@ function PlaylistEditor() {
         },
       });
 
-      if (response.data.success) {
-        navigate(`/playlist/${response.data.playlist_id}`);
+      // Imports run in the background; poll the job until it finishes or the deadline passes
+      let job = response.data;
+      const deadline = Date.now() + IMPORT_POLL_TIMEOUT_MS;
+      while ((job.status === 'queued' || job.status === 'running') && Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusResponse = await axios.get(`/api/playlists/import-xml/${job.job_id}`);
+        job = statusResponse.data;
+      }
+
+      if (job.status === 'queued' || job.status === 'running') {
+        setError('The import is taking longer than expected. It keeps running on the server; check the dashboard later.');
+      } else if (job.result?.success) {
+        navigate(`/playlist/${job.result.playlist_id}`);
       } else {
-        setError(response.data.message);
+        setError(job.result?.message || 'Failed to import XML');
       }
     } catch (error) {
       setError(error.response?.data?.detail || 'Failed to import XML');